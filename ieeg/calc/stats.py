@@ -101,8 +101,6 @@ def outlier_repeat(data: np.ndarray, sd: float, rounds: int = np.inf,
     >>> tuple(outlier_repeat(data, 1, rounds=0))
     ()
     """
-    inds = list(range(data.shape[axis]))
-
     # Square the data and set zeros to small positive number
     R2 = np.square(data)
     R2[np.where(R2 == 0)] = 1e-9
@@ -110,26 +108,169 @@ def outlier_repeat(data: np.ndarray, sd: float, rounds: int = np.inf,
     # find all axes that are not channels (example: time, trials)
     axes = tuple(i for i in range(data.ndim) if not i == axis)
 
-    # Initialize stats loop
     sig = np.std(R2, axes)  # take standard deviation of each channel
-    cutoff = (sd * np.std(sig)) + np.mean(sig)  # outlier cutoff
-    i = 1
+    yield from sig_outliers(sig, sd, rounds)
+
+
+def sig_outliers(sig: np.ndarray, sd: float, rounds: int = np.inf
+                 ) -> tuple[tuple[int, int]]:
+    """ Repeatedly remove outliers from a per channel statistic.
+
+    The rounds of :func:`outlier_repeat` only depend on the standard deviation
+    of each channel, which does not change as other channels are removed, so
+    they can be run on that summary alone. Channels are sorted once, so each
+    round finds the channels above the cutoff from the largest remaining
+    statistic down. The cutoff is computed from the remaining channels in
+    their original order, so that channels lying on it are treated exactly as
+    in :func:`outlier_repeat`.
 
-    # remove bad channels and re-calculate variance until no outliers are left
-    while np.any(np.where(sig > cutoff)) and i <= rounds:
+    Parameters
+    ----------
+    sig : np.ndarray
+        The statistic of each channel, shape (n_channels,).
+    sd : float
+        Number of standard deviations from the mean to consider an outlier.
+    rounds : int
+        Number of times to repeat outlier removal.
 
-        # Pop out names to bads output using comprehension list
-        for j, out in enumerate(np.where(sig > cutoff)[0]):
-            yield inds.pop(out - j), i
+    Returns
+    -------
+    tuple[tuple[int, int]]
+        Tuple of tuples containing the index of the outlier and the round in
+        which it was removed.
+
+    Examples
+    --------
+    >>> tuple(sig_outliers(np.array([0., 60., 0., 10., 0.]), 1))
+    ((1, 1), (3, 2))
+    >>> tuple(sig_outliers(np.array([0., 60., 0., 10., 0.]), 1, rounds=1))
+    ((1, 1),)
+    """
+    sig = np.asarray(sig, dtype=float).ravel()
+    n = sig.size
+    if n == 0:
+        return
+
+    order = np.argsort(-sig, kind='stable')  # largest statistic first
+    top = 0  # position in order of the largest remaining channel
+    removed = np.zeros(n, dtype=bool)
+    first = 0  # lowest remaining channel index
+    i = 1
 
-        # re-calculate per channel variance
-        R2 = R2[..., np.where(sig < cutoff)[0], :]
-        sig = np.std(R2, axes)
-        cutoff = (sd * np.std(sig)) + np.mean(sig)
+    # remove bad channels and update the cutoff until no outliers are left
+    while i <= rounds and top < n:
+        rest = sig[~removed]
+        cutoff = (sd * np.std(rest)) + np.mean(rest)  # outlier cutoff
+
+        # channels at or above the cutoff are at the top of the order
+        end = top
+        while end < order.size and sig[order[end]] >= cutoff:
+            end += 1
+        drop = order[top:end]
+        outs = np.sort(drop[sig[drop] > cutoff])
+
+        # a lone outlier in the first remaining position ends the search
+        if outs.size == 0 or (outs.size == 1 and outs[0] == first):
+            break
+
+        for out in outs:
+            yield int(out), i
+
+        removed[drop] = True
+        top = end
+        while first < removed.size and removed[first]:
+            first += 1
         i += 1
 
 
-def find_outliers(data: np.ndarray, outliers: float) -> np.ndarray[bool]:
+def detrended_power_std(read: callable, n_times: int, chunk_size: int
+                        ) -> np.ndarray:
+    """ Standard deviation of the squared, linearly detrended signal.
+
+    Computes the statistic that :func:`outlier_repeat` uses on data detrended
+    with :func:`scipy.signal.detrend`, reading the signal one chunk at a time
+    so memory does not depend on the signal length. A first pass over the
+    chunks fits the linear trend of each channel, and a second pass
+    accumulates the mean and variance of the squared residuals, merging the
+    chunks as in [1]_.
+
+    Parameters
+    ----------
+    read : callable
+        A function that takes a start and stop sample and returns the signal,
+        shaped (n_channels, n_times), in that range.
+    n_times : int
+        The total number of samples in the signal.
+    chunk_size : int
+        The number of samples to read at a time.
+
+    Returns
+    -------
+    np.ndarray
+        The statistic of each channel, shape (n_channels,).
+
+    References
+    ----------
+    .. [1] Chan, Golub & LeVeque (1983), Algorithms for computing the sample
+       variance, The American Statistician 37(3), 242-247.
+
+    Examples
+    --------
+    >>> from scipy.signal import detrend
+    >>> rng = np.random.default_rng(42)
+    >>> data = rng.standard_normal((3, 1000)) + np.linspace(0, 5, 1000)
+    >>> expected = np.std(np.square(detrend(data)), 1)
+    >>> out = detrended_power_std(lambda i, j: data[:, i:j], 1000, 300)
+    >>> np.allclose(out, expected)
+    True
+    """
+    bounds = [(i, min(i + chunk_size, n_times))
+              for i in range(0, n_times, chunk_size)]
+    # time rescaled to [-1, 1] keeps the fit well conditioned
+    half = max(n_times - 1, 1) / 2
+
+    def tau(start: int, stop: int) -> np.ndarray:
+        return (np.arange(start, stop) - half) / half
+
+    # first pass: least squares linear fit x = offset + a + b * tau, with the
+    # signal offset by its first chunk mean to limit cancellation
+    offset = sx = sxt = None
+    for start, stop in bounds:
+        x = np.asarray(read(start, stop), dtype=float)
+        if x.shape[-1] != stop - start:
+            raise ValueError(f"Read {x.shape[-1]} samples from {start} to "
+                             f"{stop}, expected {stop - start}")
+        if offset is None:
+            offset = x.mean(-1, keepdims=True)
+            sx = np.zeros(x.shape[0])
+            sxt = np.zeros(x.shape[0])
+        x = x - offset
+        sx += x.sum(-1)
+        sxt += x @ tau(start, stop)
+    t = tau(0, n_times)
+    st1, st2 = t.sum(), t @ t
+    det = n_times * st2 - st1 ** 2
+    a = ((st2 * sx - st1 * sxt) / det)[:, None] + offset
+    b = ((n_times * sxt - st1 * sx) / det)[:, None]
+
+    # second pass: moments of the squared residuals
+    n = mean = m2 = 0
+    for start, stop in bounds:
+        r2 = np.square(np.asarray(read(start, stop), dtype=float) - a -
+                       b * tau(start, stop))
+        r2[r2 == 0] = 1e-9  # as in outlier_repeat
+        nb = r2.shape[-1]
+        mb = r2.mean(-1)
+        m2b = np.sum(np.square(r2 - mb[:, None]), -1)
+        delta = mb - mean
+        mean = mean + delta * nb / (n + nb)
+        m2 = m2 + m2b + delta ** 2 * n * nb / (n + nb)
+        n += nb
+    return np.sqrt(m2 / n)
+
+
+def find_outliers(data: np.ndarray, outliers: float, batch_size: int = None
+                  ) -> np.ndarray[bool]:
     """ Find outliers in data matrix.
 
     This function finds outliers in a data matrix. Outliers are defined as any
@@ -143,6 +284,9 @@ def find_outliers(data: np.ndarray, outliers: float) -> np.ndarray[bool]:
         Data to find outliers in.
     outliers : float
         Number of standard deviations from the mean to consider an outlier.
+    batch_size : int, optional
+        Number of trials to process at a time, bounding the size of the
+        temporary copy of the data. By default, all trials at once.
 
     Returns
     -------
@@ -160,11 +304,28 @@ def find_outliers(data: np.ndarray, outliers: float) -> np.ndarray[bool]:
     array([ True,  True,  True,  True,  True])
     >>> find_outliers(data, 0.1)
     array([ True, False,  True, False,  True])
+    >>> find_outliers(data, 0.1, batch_size=2)
+    array([ True, False,  True, False,  True])
     """
-    dat = np.abs(data)  # (trials X channels X (frequency) X time)
-    max = np.max(dat, axis=-1)  # (trials X channels X (frequency))
-    std = np.std(dat, axis=(-1, 0))  # (channels X (frequency))
-    mean = np.mean(dat, axis=(-1, 0))  # (channels X (frequency))
+    n_trials = data.shape[0]
+    if batch_size is None:
+        batch_size = n_trials
+    max = np.empty(data.shape[:-1])  # (trials X channels X (frequency))
+    means = np.empty(data.shape[:-1])
+    var = np.empty(data.shape[:-1])
+
+    # one pass over batches of trials, with only a batch sized copy of |data|
+    for start in range(0, n_trials, batch_size):
+        sl = slice(start, start + batch_size)
+        dat = np.abs(data[sl])  # (trials X channels X (frequency) X time)
+        max[sl] = np.max(dat, axis=-1)
+        means[sl] = np.mean(dat, axis=-1)
+        var[sl] = np.var(dat, axis=-1)
+
+    # every trial has the same length, so the overall moments are the mean of
+    # the within trial moments plus the variance of the trial means
+    mean = np.mean(means, axis=0)  # (channels X (frequency))
+    std = np.sqrt(np.mean(var, axis=0) + np.var(means, axis=0))
     keep = max < ((outliers * std) + mean)  # (trials X channels X (frequency))
     return keep
 
@@ -924,7 +1085,7 @@ def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray
     # figure out which freqs to remove using F stat
 
     # estimated coefficient
-    x_hat = A * np.reshape(H0, (-1, 1))
+    x_hat = A[..., np.newaxis, :] * np.reshape(H0, (-1, 1))
 
     # numerator for F-statistic
     num = (n_tapers - 1) * (A * A.conj()).real * H0_sq
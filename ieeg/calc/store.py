@@ -0,0 +1,431 @@
+import h5py
+import numpy as np
+from joblib import Parallel, delayed
+
+from ieeg import Signal
+from ieeg.calc.mat import LabeledArray, Labels, is_unique
+from ieeg.process import ensure_int
+
+_REDUCTIONS = ('sum', 'nansum', 'min', 'max', 'nanmin', 'nanmax', 'mean',
+               'nanmean', 'var', 'nanvar', 'std', 'nanstd')
+_CHUNK_OTHER = 8
+_CHUNK_LAST = 4096
+
+
+class EpochStore:
+    """A chunked, compressed on-disk store of labeled epoched data.
+
+    Stores an array such as trials x channels x [freqs] x time in an HDF5
+    file together with the labels of every dimension, so that datasets larger
+    than memory can be built up and analysed piece by piece. Data is appended
+    along one axis (trials by default), slices by label are read lazily, and
+    reductions are computed chunk by chunk, optionally in parallel.
+
+    Appended data is aligned to the store by label along the other axes (see
+    :meth:`append`): channels missing from an append are filled with NaN,
+    while an append with channel labels that are not already in the store is
+    rejected, so the store must be created from data holding every channel.
+
+    Parameters
+    ----------
+    fname : str
+        The HDF5 file to store the data in. It is created if it does not
+        exist.
+    axis : int, optional
+        The axis new data is appended along, by default 0. Only used when
+        the store is created.
+    dtype : np.dtype, optional
+        The dtype to store the data as, by default the dtype of the first
+        appended data. Only used when the store is created.
+    compression : str, optional
+        The HDF5 compression filter, by default 'lzf'
+    chunk_size : int, optional
+        The number of elements along ``axis`` per chunk, by default 1. Chunks
+        span up to 8 elements of the other axes and 4096 of the last one.
+
+    Examples
+    --------
+    >>> import tempfile, os
+    >>> fname = os.path.join(tempfile.mkdtemp(), 'store.h5')
+    >>> store = EpochStore(fname)
+    >>> store.append(LabeledArray(np.arange(12.).reshape(2, 3, 2),
+    ...     [('aud', 'go'), ('A1', 'A2', 'A3'), ('0.0', '0.1')]))
+    >>> store.append(LabeledArray(np.arange(12., 18.).reshape(1, 3, 2),
+    ...     [('aud',), ('A1', 'A2', 'A3'), ('0.0', '0.1')]))
+    >>> store.shape
+    (3, 3, 2)
+    >>> store['aud', 'A2']
+    array([[ 2.,  3.],
+           [14., 15.]])
+    labels(['aud', 'aud']
+           ['0.0', '0.1'])
+    >>> store.reduce('mean', axis=(0, 2))
+    array([ 6.5,  8.5, 10.5])
+    labels(['A1', 'A2', 'A3'])
+    """
+
+    def __init__(self, fname: str, axis: int = 0, dtype: np.dtype = None,
+                 compression: str = 'lzf', chunk_size: int = 1):
+        self.fname = str(fname)
+        self._axis = ensure_int(axis, 'axis')
+        self._dtype = dtype
+        self.compression = compression
+        self.chunk_size = ensure_int(chunk_size, 'chunk_size')
+        with h5py.File(self.fname, 'a') as f:
+            if 'data' in f:
+                self._axis = int(f['data'].attrs['axis'])
+                self._read_meta(f)
+            else:
+                self.shape = None
+                self.labels = None
+
+    def _read_meta(self, f: h5py.File):
+        self.shape = f['data'].shape
+        self.labels = [Labels(f[f'labels/{i}'].asstr()[()])
+                       for i in range(len(self.shape))]
+
+    @property
+    def axis(self) -> int:
+        """The axis data is appended along."""
+        return self._axis
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[self.axis]
+
+    def append(self, data: LabeledArray | Signal | np.ndarray,
+               labels: list = None):
+        """Appends data to the store.
+
+        Parameters
+        ----------
+        data : LabeledArray | Signal | np.ndarray
+            The data to append. Signals are converted with
+            :meth:`LabeledArray.from_signal`.
+        labels : list, optional
+            The labels of each dimension of ``data``, when it is not already
+            labeled.
+
+        Notes
+        -----
+        Along every axis but the append axis, data is aligned to the store by
+        label. When the labels are unique, data whose labels are all found in
+        the store is reordered to match it, and labels it lacks are padded
+        with NaN. This allows appending subjects with different channels, or a
+        different number of trials along the channel axis. Repeated labels,
+        such as condition names of trials, are matched by position, and data
+        shorter than the store is padded with NaN. Data with labels that are
+        not in the store, or repeated labels that do not match the store at
+        their positions, raises a ValueError and is not appended.
+        """
+        if isinstance(data, Signal):
+            data = LabeledArray.from_signal(data)
+        elif not isinstance(data, LabeledArray):
+            data = LabeledArray(data, labels or ())
+        with h5py.File(self.fname, 'a') as f:
+            if 'data' not in f:
+                self._create(f, data)
+            ds = f['data']
+            if data.ndim != ds.ndim:
+                raise ValueError(f"Data must have {ds.ndim} dimensions, got "
+                                 f"{data.ndim}")
+            aligned = self._align(data, ds.dtype)
+            start = ds.shape[self.axis]
+            stop = start + data.shape[self.axis]
+            ds.resize(stop, self.axis)
+            idx = [slice(None)] * ds.ndim
+            idx[self.axis] = slice(start, stop)
+            ds[tuple(idx)] = aligned
+            lab = f[f'labels/{self.axis}']
+            lab.resize((stop,))
+            lab[start:stop] = np.asarray(data.labels[self.axis], dtype=object)
+            self._read_meta(f)
+
+    def _create(self, f: h5py.File, data: LabeledArray):
+        while self._axis < 0:
+            self._axis += data.ndim
+        dtype = np.dtype(self._dtype or data.dtype)
+        shape = list(data.shape)
+        shape[self.axis] = 0
+        maxshape = list(data.shape)
+        maxshape[self.axis] = None
+        # chunk the other axes too, so label slices only read what they need
+        chunks = [min(n, _CHUNK_LAST if i == data.ndim - 1 else _CHUNK_OTHER)
+                  for i, n in enumerate(data.shape)]
+        chunks[self.axis] = self.chunk_size
+        ds = f.create_dataset('data', shape, dtype, maxshape=tuple(maxshape),
+                              chunks=tuple(chunks),
+                              compression=self.compression,
+                              fillvalue=np.nan if dtype.kind in 'fc' else 0)
+        ds.attrs['axis'] = self.axis
+        for i, lab in enumerate(data.labels):
+            if i == self.axis:
+                lab = np.array([], dtype=object)
+            f.create_dataset(f'labels/{i}', data=np.asarray(lab, object),
+                             dtype=h5py.string_dtype(),
+                             maxshape=(None,) if i == self.axis else None)
+        self._read_meta(f)
+
+    def _align(self, data: LabeledArray, dtype: np.dtype) -> np.ndarray:
+        """Reorders and pads data to match the labels of the store."""
+        out_shape = list(self.shape)
+        out_shape[self.axis] = data.shape[self.axis]
+        if tuple(out_shape) == data.shape and all(
+                np.array_equal(a, b) for i, (a, b) in enumerate(
+                    zip(self.labels, data.labels)) if i != self.axis):
+            return np.asarray(data, dtype=dtype)
+
+        # positions in the store of each element of the data along each axis
+        targets = []
+        for i, (stored, new) in enumerate(zip(self.labels, data.labels)):
+            if i == self.axis:
+                targets.append(np.arange(data.shape[i]))
+            elif is_unique(stored) and is_unique(new):
+                missing = np.asarray(new)[~np.isin(new, stored)]
+                if missing.size:
+                    raise ValueError(f"Labels {missing.tolist()} on axis {i} "
+                                     f"of the data are not in the store")
+                pos = {lab: j for j, lab in enumerate(stored.tolist())}
+                targets.append(np.array([pos[lab] for lab in new.tolist()]))
+            elif len(new) > len(stored):
+                raise ValueError(f"Axis {i} of the data is longer than the "
+                                 f"store, {len(new)} > {len(stored)}")
+            elif np.array_equal(np.asarray(stored)[:len(new)], new):
+                targets.append(np.arange(len(new)))
+            else:
+                raise ValueError(f"Labels on axis {i} of the data do not "
+                                 f"match the store by position: "
+                                 f"{np.asarray(new).tolist()} != "
+                                 f"{np.asarray(stored)[:len(new)].tolist()}")
+        out = np.full(out_shape, np.nan, dtype=dtype)
+        out[np.ix_(*targets)] = data
+        return out
+
+    def _parse_keys(self, keys) -> tuple[list[np.ndarray], list[bool]]:
+        """Converts label, integer, slice and mask keys to index arrays."""
+        if not isinstance(keys, tuple):
+            keys = (keys,)
+        if any(k is Ellipsis for k in keys):
+            i = [k is Ellipsis for k in keys].index(True)
+            keys = keys[:i] + (slice(None),) * (self.ndim - len(keys) + 1) + \
+                keys[i + 1:]
+        if len(keys) > self.ndim:
+            raise IndexError(f"Too many indices for store: store is "
+                             f"{self.ndim}-dimensional, but {len(keys)} were "
+                             f"indexed")
+        keys += (slice(None),) * (self.ndim - len(keys))
+        idx, keep = [], []
+        for i, key in enumerate(keys):
+            if isinstance(key, str):
+                key = self.labels[i].find(key)
+            if isinstance(key, slice):
+                ind = np.arange(self.shape[i])[key]
+            elif np.isscalar(key):
+                ind = np.array([int(key) % self.shape[i]])
+            else:
+                key = np.asarray(key)
+                if key.dtype == bool:
+                    ind = np.flatnonzero(key)
+                elif key.dtype.kind in 'US':
+                    ind = np.array([self.labels[i].find(k) for k in key])
+                else:
+                    ind = key.astype(int) % self.shape[i]
+            idx.append(ind)
+            keep.append(not np.isscalar(key))
+        return idx, keep
+
+    def __getitem__(self, keys) -> LabeledArray:
+        idx, keep = self._parse_keys(keys)
+        with h5py.File(self.fname, 'r') as f:
+            out = _read(f['data'], idx, self.axis)
+        labels = [lab[ind] for lab, ind in zip(self.labels, idx)]
+        squeeze = tuple(i for i, k in enumerate(keep) if not k)
+        out = out.squeeze(squeeze)
+        if out.ndim == 0:
+            return out[()]
+        return LabeledArray(out, [lab for lab, k in zip(labels, keep) if k])
+
+    def blocks(self, block_size: int = None) -> list[slice]:
+        """Splits the append axis into slices aligned to the chunks."""
+        if block_size is None:
+            block_size = self.chunk_size * max(1, 64 // self.chunk_size)
+        n = self.shape[self.axis]
+        return [slice(i, min(i + block_size, n))
+                for i in range(0, n, block_size)]
+
+    def map_blocks(self, func: callable, block_size: int = None,
+                   n_jobs: int = 1) -> list:
+        """Applies a function to each block of the store along its axis.
+
+        Parameters
+        ----------
+        func : callable
+            Function taking a block of data as an array.
+        block_size : int, optional
+            The number of elements along the append axis per block, by
+            default a multiple of the chunk size.
+        n_jobs : int, optional
+            The number of blocks to process in parallel, by default 1
+
+        Returns
+        -------
+        list
+            The output of the function for each block.
+        """
+        blocks = self.blocks(block_size)
+        if n_jobs == 1:
+            return [_apply_block(self.fname, self.axis, b, func)
+                    for b in blocks]
+        return Parallel(n_jobs=n_jobs)(delayed(_apply_block)(
+            self.fname, self.axis, b, func) for b in blocks)
+
+    def reduce(self, func: str, axis: int | tuple[int] = None,
+               block_size: int = None, n_jobs: int = 1, ddof: int = 0
+               ) -> LabeledArray:
+        """Computes a reduction over the store one block at a time.
+
+        Parameters
+        ----------
+        func : str
+            The numpy reduction, one of 'sum', 'min', 'max', 'mean', 'var' or
+            'std', or their nan variants.
+        axis : int | tuple[int], optional
+            The axes to reduce over, by default all of them.
+        block_size : int, optional
+            The number of elements along the append axis per block.
+        n_jobs : int, optional
+            The number of blocks to process in parallel, by default 1
+        ddof : int, optional
+            Delta degrees of freedom for 'var' and 'std', by default 0
+
+        Returns
+        -------
+        LabeledArray
+            The reduced data, labeled by the remaining axes.
+        """
+        if func not in _REDUCTIONS:
+            raise ValueError(f"func must be one of {_REDUCTIONS}, got {func}")
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        axis = tuple(a % self.ndim for a in np.atleast_1d(axis))
+        parts = self.map_blocks(_BlockReducer(func, axis, self.axis, ddof),
+                                block_size, n_jobs)
+        if self.axis not in axis:
+            out = np.concatenate(parts, self.axis - sum(
+                a < self.axis for a in axis))
+        elif func.endswith(('sum', 'min', 'max')):
+            combine = {'sum': np.add, 'nansum': np.add, 'min': np.minimum,
+                       'max': np.maximum, 'nanmin': np.fmin,
+                       'nanmax': np.fmax}[func]
+            out = parts[0]
+            for p in parts[1:]:
+                out = combine(out, p)
+            out = out.squeeze(axis)
+        else:
+            n, mean, m2 = parts[0]
+            for nb, mb, m2b in parts[1:]:
+                n, mean, m2 = _combine_moments(n, mean, m2, nb, mb, m2b)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if func.endswith('mean'):
+                    out = np.where(n > 0, mean, np.nan)
+                else:
+                    out = m2 / (n - ddof)
+                    if func.endswith('std'):
+                        out = np.sqrt(out)
+            out = out.squeeze(axis)
+        labels = [lab for i, lab in enumerate(self.labels) if i not in axis]
+        if out.ndim == 0:
+            return out[()]
+        return LabeledArray(out, labels)
+
+
+def _read(ds: h5py.Dataset, idx: list[np.ndarray], axis: int) -> np.ndarray:
+    """Reads the selected indices of a dataset.
+
+    Contiguous index ranges are read as slabs, and otherwise h5py is given
+    sorted indices along the append axis only, the rest are taken in memory.
+    """
+    sel = []
+    post = []
+    for i, ind in enumerate(idx):
+        if len(ind) == 0:
+            sel.append(slice(0, 0))
+            post.append(slice(None))
+        elif np.array_equal(ind, np.arange(ind[0], ind[0] + len(ind))):
+            sel.append(slice(int(ind[0]), int(ind[0]) + len(ind)))
+            post.append(slice(None))
+        elif i == axis:
+            uniq, inv = np.unique(ind, return_inverse=True)
+            sel.append(uniq)
+            post.append(inv)
+        else:
+            sel.append(slice(int(ind.min()), int(ind.max()) + 1))
+            post.append(ind - ind.min())
+    out = ds[tuple(sel)]
+    for i, p in enumerate(post):
+        if not isinstance(p, slice):
+            out = np.take(out, p, axis=i)
+    return out
+
+
+def _apply_block(fname: str, axis: int, block: slice, func: callable):
+    with h5py.File(fname, 'r') as f:
+        idx = [slice(None)] * f['data'].ndim
+        idx[axis] = block
+        data = f['data'][tuple(idx)]
+    return func(data)
+
+
+class _BlockReducer:
+    """Partial reduction of one block, picklable for parallel workers."""
+
+    def __init__(self, func: str, axis: tuple[int], store_axis: int,
+                 ddof: int = 0):
+        self.func = func
+        self.axis = axis
+        self.store_axis = store_axis
+        self.ddof = ddof
+
+    def __call__(self, x: np.ndarray):
+        if self.store_axis not in self.axis:
+            return getattr(np, self.func)(x, axis=self.axis, ddof=self.ddof) \
+                if self.func.endswith(('var', 'std')) else \
+                getattr(np, self.func)(x, axis=self.axis)
+        elif self.func.endswith(('sum', 'min', 'max')):
+            return getattr(np, self.func)(x, axis=self.axis, keepdims=True)
+        if self.func.startswith('nan'):
+            n = np.sum(~np.isnan(x), axis=self.axis, keepdims=True)
+            total = np.nansum(x, axis=self.axis, keepdims=True)
+        else:
+            n = np.full_like(x.sum(axis=self.axis, keepdims=True),
+                             np.prod([x.shape[a] for a in self.axis]),
+                             dtype=float)
+            total = np.sum(x, axis=self.axis, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+        if self.func.startswith('nan'):
+            mean = np.nan_to_num(mean)
+            m2 = np.nansum((x - mean) ** 2, axis=self.axis, keepdims=True)
+        else:
+            m2 = np.sum((x - mean) ** 2, axis=self.axis, keepdims=True)
+        return n, mean, m2
+
+
+def _combine_moments(na, ma, m2a, nb, mb, m2b):
+    """Combines the counts, means and sums of squares of two blocks [1]_.
+
+    References
+    ----------
+    .. [1] Chan, Golub & LeVeque (1983), Algorithms for computing the sample
+       variance, The American Statistician 37(3), 242-247.
+    """
+    n = na + nb
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = mb - ma
+        frac = np.where(n > 0, nb / n, 0)
+        mean = ma + delta * frac
+        m2 = m2a + m2b + delta ** 2 * na * frac
+    return n, mean, m2
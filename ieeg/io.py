@@ -1,33 +1,48 @@
+import csv
+import hashlib
+import json
 import re
-from functools import singledispatch
-from os import listdir, mkdir, path as op, walk
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, singledispatch
+from os import (getpid, listdir, makedirs, path as op, replace, scandir,
+                stat, walk)
+from shutil import rmtree
+from tempfile import mkdtemp
 
 import mne
 import numpy as np
 import pandas as pd
 from bids import BIDSLayout
 from bids.layout import BIDSFile, parse_file_entities
+from joblib import cpu_count
+from mne.io import BaseRaw
 from mne.utils import fill_doc, verbose
-from mne_bids import BIDSPath, get_bids_path_from_fname, mark_channels, \
-    read_raw_bids, write_raw_bids
-from mne_bids.write import _from_tsv
+from mne_bids import BIDSPath, get_bids_path_from_fname, \
+    make_dataset_description, mark_channels, read_raw_bids, write_raw_bids
+from mne_bids.write import _channels_tsv, _from_tsv, _sidecar_json
 
 from ieeg import PathLike, Signal
 
 
-def find_dat(folder: PathLike) -> (PathLike, PathLike):
+def find_dat(folder: PathLike, catalog: 'Catalog' = None
+             ) -> (PathLike, PathLike):
     """Looks for the .dat file in a specified folder
 
     Parameters
     ----------
     folder : PathLike
         The folder to search in.
+    catalog : Catalog, optional
+        A catalog of the lab directory to look the files up in instead of
+        walking the folder, by default None
 
     Returns
     -------
     Tuple[PathLike, PathLike]
         The paths to the ieeg and cleanieeg files.
     """
+    if catalog is not None:
+        return catalog.find_dat(folder)
     cleanieeg = None
     ieeg = None
     for root, _, files in walk(folder):
@@ -74,9 +89,14 @@ def bidspath_from_layout(layout: BIDSLayout, **kwargs) -> BIDSPath:
 
 @fill_doc
 def raw_from_layout(layout: BIDSLayout, preload: bool = True,
-                    run: list[int] | int = None, **kwargs) -> mne.io.Raw:
+                    run: list[int] | int = None, n_jobs: int = 1,
+                    **kwargs) -> mne.io.Raw:
     """Searches a BIDSLayout for a raw file and returns a mne Raw object.
 
+    When several runs are found they are concatenated, with 'BAD boundary'
+    annotations marking where each run starts. If preload is True, all runs
+    are decoded directly into one preallocated array.
+
     Parameters
     ----------
     layout : BIDSLayout
@@ -84,6 +104,9 @@ def raw_from_layout(layout: BIDSLayout, preload: bool = True,
     %(preload)s
     run : Union[List[int], int], optional
         The run to search for, by default None
+    n_jobs : int, optional
+        The number of threads used to read the runs concurrently, by default 1.
+        Negative values count back from the number of cores.
     **kwargs : dict
         The parameters passed to bids.BIDSLayout.get()
 
@@ -105,25 +128,139 @@ def raw_from_layout(layout: BIDSLayout, preload: bool = True,
     if run is None:
         runs = layout.get(return_type="id", target="run", **kwargs)
     else:
-        runs = list(run)
-    raw: list[mne.io.Raw] = []
+        runs = list(np.atleast_1d(run))
+    n_jobs = _thread_count(n_jobs, max(len(runs), 1))
     if runs:
-        for r in runs:
-            BIDS_path = bidspath_from_layout(layout, run=r, **kwargs)
-            new_raw = read_raw_bids(bids_path=BIDS_path, verbose=verbose)
-            raw.append(new_raw.copy())
+        paths = [bidspath_from_layout(layout, run=r, **kwargs) for r in runs]
+        with ThreadPoolExecutor(n_jobs) as pool:
+            raw = list(pool.map(lambda p: read_raw_bids(
+                bids_path=p, verbose=verbose), paths))
         whole_raw: mne.io.Raw = mne.concatenate_raws(raw)
     else:
         BIDS_path = bidspath_from_layout(layout, **kwargs)
         whole_raw = read_raw_bids(bids_path=BIDS_path, verbose=verbose)
-    if preload:
-        whole_raw.load_data()
+    if preload and not whole_raw.preload:
+        _load_runs(whole_raw, n_jobs, raw[1:] if runs else ())
     return whole_raw
 
 
+def _thread_count(n_jobs: int, n_tasks: int) -> int:
+    """Convert a joblib style n_jobs to a number of threads."""
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = max(cpu_count() + 1 + n_jobs, 1)
+    return max(min(n_jobs, n_tasks), 1)
+
+
+def _load_runs(raw: mne.io.BaseRaw, n_jobs: int = 1,
+               readers: list[mne.io.BaseRaw] = ()):
+    """Load every file of a raw instance into one preallocated array.
+
+    Each file is decoded straight into its own slice of the output, so no
+    per-run copies are made, and files are read concurrently in threads.
+    Once the data is loaded, the raw instance and the per-run ``readers`` it
+    was concatenated from are closed, as ``BaseRaw.load_data`` does.
+    """
+    bounds = np.cumsum([0] + list(raw._raw_lengths))
+    data = np.empty((raw.info['nchan'], raw.n_times), dtype=raw._dtype)
+
+    def read(start, stop):
+        raw._read_segment(start, stop, data_buffer=data[:, start:stop])
+
+    try:
+        with ThreadPoolExecutor(n_jobs) as pool:
+            list(pool.map(read, bounds[:-1], bounds[1:]))
+    finally:
+        for reader in (raw, *readers):
+            reader.close()
+    raw._data = data
+    raw.preload = True
+    raw._comp = None
+
+
+def _unit_factor(units: str) -> float:
+    match units:
+        case "V":
+            return 1
+        case "mV":
+            return 1e-3
+        case "uV":
+            return 1e-6
+        case "nV":
+            return 1e-9
+        case _:
+            raise NotImplementedError("Unit " + units + " not implemented yet")
+
+
+@fill_doc
+class RawDat(BaseRaw):
+    """Lazy, memory-mapped Raw for float32 .dat recordings.
+
+    The .dat file holds float32 samples interleaved across channels (sample
+    major). Data is only read from disk for the requested channels and
+    samples, and unit scaling is applied on the fly through the channel
+    calibrations.
+
+    Parameters
+    ----------
+    file_path : PathLike
+        The path to the .dat file.
+    channels : list[str]
+        The channels in the file. A "Trigger" channel is ignored.
+    sfreq : int, optional
+        The sampling frequency, by default 2048
+    types : str, optional
+        The channel types, by default "seeg"
+    units : str, optional
+        The units of the data, by default "uV"
+    %(preload)s
+    %(verbose)s
+    """
+
+    @verbose
+    def __init__(self, file_path: PathLike, channels: list[str],
+                 sfreq: int = 2048, types: str = "seeg", units: str = "uV",
+                 preload: bool = False, verbose=None):
+        channels = [ch for ch in channels if ch != "Trigger"]
+        factor = _unit_factor(units)
+        n_bytes = op.getsize(file_path)
+        bytes_per = np.dtype("<f4").itemsize * len(channels)
+        if n_bytes % bytes_per:
+            raise ValueError(f"File size of {file_path} ({n_bytes} bytes) is "
+                             f"not a multiple of {len(channels)} float32 "
+                             f"channels")
+        n_times = n_bytes // bytes_per
+
+        info = mne.create_info(channels, sfreq, types)
+        with info._unlock():
+            for ch in info['chs']:
+                ch['cal'] = factor
+        super().__init__(info, preload, last_samps=[n_times - 1],
+                         filenames=[file_path],
+                         raw_extras=[dict(n_channels=len(channels))],
+                         orig_format='single', verbose=verbose)
+
+    def _read_segment_file(self, data, idx, fi, start, stop, cals, mult):
+        """Read a chunk of data from the memory-mapped file."""
+        n_channels = self._raw_extras[fi]['n_channels']
+        itemsize = np.dtype("<f4").itemsize
+        mm = np.memmap(self._filenames[fi], dtype="<f4", mode='r',
+                       offset=start * n_channels * itemsize,
+                       shape=(stop - start, n_channels))
+        one = mm[:, idx].T
+        if mult is not None:
+            data[:] = mult @ one
+        else:
+            data[:] = one
+            data *= cals
+
+
+@fill_doc
 def open_dat_file(file_path: str, channels: list[str], sfreq: int = 2048,
-                  types: str = "seeg", units: str = "uV") -> mne.io.RawArray:
-    """Opens a .dat file and returns a mne.io.RawArray object.
+                  types: str = "seeg", units: str = "uV",
+                  preload: bool = True) -> RawDat:
+    """Opens a .dat file and returns a mne Raw object.
 
     Parameters
     ----------
@@ -137,33 +274,20 @@ def open_dat_file(file_path: str, channels: list[str], sfreq: int = 2048,
         The channel types, by default "seeg"
     units : str, optional
         The units of the data, by default "uV"
+    preload : bool, optional
+        Whether to read the data into memory, by default True. Pass False to
+        keep the file memory-mapped and only read what is requested.
 
     Returns
     -------
-    mne.io.RawArray
+    RawDat
+        The raw data.
     """
-    with open(file_path, mode='rb') as f:
-        data = np.fromfile(f, dtype="float32")
-    if "Trigger" in channels:
-        channels.remove("Trigger")
-    array = np.reshape(data, [len(channels), -1], order='F')
-    match units:
-        case "V":
-            factor = 1
-        case "mV":
-            factor = 1e-3
-        case "uV":
-            factor = 1e-6
-        case "nV":
-            factor = 1e-9
-        case _:
-            raise NotImplementedError("Unit " + units + " not implemented yet")
-    info = mne.create_info(channels, sfreq, types)
-    raw = mne.io.RawArray(array * factor, info)
-    return raw
+    return RawDat(file_path, channels, sfreq, types, units, preload)
 
 
-def get_data(task: str, root: PathLike) -> BIDSLayout:
+def get_data(task: str, root: PathLike, cache: bool = False,
+             catalog: 'Catalog' = None) -> BIDSLayout:
     """Gets the data for a subject and task.
 
     Parameters
@@ -172,6 +296,12 @@ def get_data(task: str, root: PathLike) -> BIDSLayout:
         The task to get the data for, by default "SentenceRep"
     root : PathLike, optional
         The path to the lab directory, by default LAB_root
+    cache : bool, optional
+        Whether to load the layout from a persistent on-disk index (see
+        :func:`cached_layout`), by default False
+    catalog : Catalog, optional
+        A catalog of the lab directory to look the BIDS directory up in
+        instead of listing the root, by default None
 
     Returns
     -------
@@ -179,25 +309,341 @@ def get_data(task: str, root: PathLike) -> BIDSLayout:
         The BIDSLayout for the subject.
     """
     BIDS_root = None
-    for dir in listdir(root):
-        if re.match(r"BIDS-\d\.\d_" + task, dir) and "BIDS" in listdir(op.join(
-                root, dir)):
-            BIDS_root = op.join(root, dir, "BIDS")
-            break
+    if catalog is not None:
+        BIDS_root = catalog.bids_root(task)
+    else:
+        for dir in listdir(root):
+            if re.match(r"BIDS-\d\.\d_" + task, dir) and "BIDS" in listdir(
+                    op.join(root, dir)):
+                BIDS_root = op.join(root, dir, "BIDS")
+                break
     if BIDS_root is None:
         raise FileNotFoundError("Could not find BIDS directory in {} for task "
                                 "{}".format(root, task))
-    layout = BIDSLayout(BIDS_root, derivatives=True)
+    if cache:
+        layout = cached_layout(BIDS_root, derivatives=True)
+    else:
+        layout = BIDSLayout(BIDS_root, derivatives=True)
+    return layout
+
+
+_IGNORE_DIRS = ("code", "derivatives", "models", "sourcedata", "stimuli")
+
+
+def _fingerprint(root: PathLike) -> str:
+    """Hash the directory and sidecar modification times of a dataset.
+
+    Directory mtimes change whenever files are added, removed or renamed, and
+    json sidecar mtimes track the metadata that gets indexed. Directories that
+    are not indexed by default (derivatives, sourcedata, hidden, etc.) are
+    skipped.
+    """
+    stamps = []
+    stack = [str(root)]
+    while stack:
+        folder = stack.pop()
+        stamps.append((op.relpath(folder, root), stat(folder).st_mtime_ns))
+        with scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                elif entry.is_dir():
+                    if folder == str(root) and entry.name in _IGNORE_DIRS:
+                        continue
+                    stack.append(entry.path)
+                elif entry.name.endswith('.json'):
+                    stamps.append((op.relpath(entry.path, root),
+                                   entry.stat().st_mtime_ns))
+    stamps.sort()
+    return hashlib.sha1(repr(stamps).encode()).hexdigest()
+
+
+def _indexed_layout(root: PathLike, database_path: PathLike,
+                    **kwargs) -> BIDSLayout:
+    """Load a single dataset from its index, re-indexing it if stale.
+
+    A stale index is rebuilt in a temporary directory and atomically moved
+    into place, so that concurrent readers only ever see a complete index.
+    """
+    db_file = op.join(database_path, "layout_index.sqlite")
+    stamp_file = op.join(database_path, "fingerprint")
+    stamp = _fingerprint(root)
+    if op.isfile(db_file) and op.isfile(stamp_file):
+        with open(stamp_file) as f:
+            if f.read() == stamp:
+                return BIDSLayout(root, database_path=database_path, **kwargs)
+
+    mne.utils.logger.info(f"Indexing {root}")
+    makedirs(database_path, exist_ok=True)
+    tmp = mkdtemp(dir=database_path, prefix=".tmp")
+    try:
+        layout = BIDSLayout(root, database_path=tmp, reset_database=True,
+                            **kwargs)
+        layout.connection_manager.engine.dispose()
+        with open(op.join(tmp, "fingerprint"), 'w') as f:
+            f.write(stamp)
+        replace(op.join(tmp, "layout_index.sqlite"), db_file)
+        replace(op.join(tmp, "fingerprint"), stamp_file)
+    finally:
+        rmtree(tmp, ignore_errors=True)
+    return BIDSLayout(root, database_path=database_path, **kwargs)
+
+
+def cached_layout(root: PathLike, database_path: PathLike = None,
+                  derivatives: bool = True, validate: bool = True
+                  ) -> BIDSLayout:
+    """Builds a BIDSLayout backed by a persistent on-disk index.
+
+    The raw dataset and each derivative pipeline are indexed into their own
+    SQLite database. On subsequent calls an index is reused as long as the
+    directory and json sidecar modification times of its dataset are
+    unchanged, so only the datasets that changed are re-indexed. Up to date
+    indices are only read, so they can be shared by concurrent jobs.
+
+    Parameters
+    ----------
+    root : PathLike
+        The root of the BIDS dataset.
+    database_path : PathLike, optional
+        The directory to store the index in, by default a hidden folder next
+        to the dataset root.
+    derivatives : bool, optional
+        Whether to index the derivative pipelines, by default True
+    validate : bool, optional
+        Whether to validate the dataset, by default True
+
+    Returns
+    -------
+    layout : BIDSLayout
+        The BIDSLayout for the dataset.
+
+    Examples
+    --------
+    >>> import mne
+    >>> from tempfile import mkdtemp
+    >>> bids_root = mne.datasets.epilepsy_ecog.data_path(verbose=False)
+    >>> db = mkdtemp()
+    >>> layout = cached_layout(bids_root, db)
+    >>> cached_layout(bids_root, db).get_subjects() == layout.get_subjects()
+    True
+    """
+    root = op.abspath(root)
+    if database_path is None:
+        head, tail = op.split(root)
+        database_path = op.join(head, f".{tail}_index")
+    layout = _indexed_layout(root, database_path, validate=validate)
+    deriv_root = op.join(root, "derivatives")
+    if derivatives and op.isdir(deriv_root):
+        for name in sorted(listdir(deriv_root)):
+            path = op.join(deriv_root, name)
+            if not op.isfile(op.join(path, "dataset_description.json")):
+                continue
+            layout.derivatives[name] = _indexed_layout(
+                path, op.join(database_path, "derivatives", name),
+                validate=validate, is_derivative=True, sources=layout)
     return layout
 
 
+_CATALOG_SKIP = ("bem", "code", "label", "mri", "scripts", "sourcedata",
+                 "stats", "surf", "tmp", "touch")
+
+
+class Catalog:
+    """Index of the recordings under a lab directory.
+
+    Records every raw .dat recording, BIDS dataset root, derivative pipeline
+    and electrode reconstruction file under ``root``, with their size and
+    modification time, so that lookups do not have to walk the (often
+    network mounted) directory tree. The catalog is persisted to disk and
+    refreshed incrementally: only directories whose modification time changed
+    are listed again, while the files already recorded in the others are only
+    stat'ed. Top level directories are scanned in parallel.
+
+    Parameters
+    ----------
+    root : PathLike
+        The lab directory to index.
+    path : PathLike, optional
+        The file to persist the catalog to, by default a hidden file next to
+        ``root``.
+    refresh : bool, optional
+        Whether to bring the catalog up to date on load, by default True
+    n_jobs : int, optional
+        The number of directories to scan concurrently, by default -1
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> root = tempfile.mkdtemp()
+    >>> makedirs(op.join(root, 'D1', 'elec_recon'))
+    >>> open(op.join(root, 'D1', 'D1_ieeg.dat'), 'w').close()
+    >>> open(op.join(root, 'D1', 'D1_cleanieeg.dat'), 'w').close()
+    >>> catalog = Catalog(root)
+    >>> [op.basename(f) for f in catalog.find_dat('D1')]
+    ['D1_ieeg.dat', 'D1_cleanieeg.dat']
+    """
+
+    def __init__(self, root: PathLike, path: PathLike = None,
+                 refresh: bool = True, n_jobs: int = -1):
+        self.root = op.abspath(root)
+        if path is None:
+            head, tail = op.split(self.root)
+            path = op.join(head, f".{tail}_catalog.json")
+        self.path = str(path)
+        self.dirs = {}
+        if op.isfile(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved.get('root') == self.root:
+                self.dirs = saved['dirs']
+        if refresh:
+            self.refresh(n_jobs)
+        else:
+            self._build_index()
+
+    def refresh(self, n_jobs: int = -1):
+        """Re-scans the directories that changed since the last scan."""
+        top = self._scan_dir('')
+        out = {'': top}
+        n_jobs = _thread_count(n_jobs, max(len(top['dirs']), 1))
+        with ThreadPoolExecutor(n_jobs) as pool:
+            for tree in pool.map(self._scan_tree, top['dirs']):
+                out.update(tree)
+        self.dirs = out
+        self._build_index()
+        tmp = f"{self.path}.{getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(dict(root=self.root, dirs=self.dirs), f)
+        replace(tmp, self.path)
+
+    def _scan_tree(self, rel: str) -> dict:
+        out = {}
+        stack = [rel]
+        while stack:
+            rel = stack.pop()
+            out[rel] = entry = self._scan_dir(rel)
+            stack.extend(entry['dirs'])
+        return out
+
+    def _scan_dir(self, rel: str) -> dict:
+        """Lists a directory, unless it is unchanged since the last scan."""
+        folder = op.join(self.root, rel)
+        mtime = stat(folder).st_mtime_ns
+        old = self.dirs.get(rel)
+        if old is not None and old['mtime'] == mtime:
+            # files rewritten in place do not touch the directory mtime
+            files = {}
+            for f in old['files']:
+                try:
+                    st = stat(op.join(folder, f))
+                except FileNotFoundError:
+                    continue
+                files[f] = [st.st_size, st.st_mtime_ns]
+            return dict(old, files=files)
+        name = op.basename(rel)
+        dirs, files = [], {}
+        with scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                elif entry.is_dir():
+                    if entry.name not in _CATALOG_SKIP:
+                        dirs.append(op.join(rel, entry.name))
+                elif (name == 'elec_recon' or entry.name.endswith('.dat')
+                      or entry.name == 'dataset_description.json'):
+                    st = entry.stat()
+                    files[entry.name] = [st.st_size, st.st_mtime_ns]
+        if 'dataset_description.json' in files:
+            # the contents of BIDS datasets are indexed by pybids
+            dirs = [d for d in dirs if op.basename(d) == 'derivatives']
+        return dict(mtime=mtime, dirs=sorted(dirs), files=files)
+
+    def _build_index(self):
+        self.dat = {}
+        self.bids = {}
+        self.derivatives = {}
+        self.recon = {}
+        for rel in sorted(self.dirs):
+            files = self.dirs[rel]['files']
+            parts = rel.split(op.sep)
+            parent = parts[-2] if len(parts) > 1 else ''
+            match = re.match(r"BIDS-\d\.\d_(.+)", parent)
+            if parts[-1] == 'BIDS' and match:
+                self.bids.setdefault(match.group(1), op.join(self.root, rel))
+            elif parent == 'derivatives' and \
+                    'dataset_description.json' in files:
+                self.derivatives.setdefault(
+                    op.join(self.root, *parts[:-2]), []).append(
+                    op.join(self.root, rel))
+            elif parts[-1] == 'elec_recon' and parent:
+                self.recon[parent] = {
+                    f: op.join(self.root, rel, f) for f in files}
+            for f in sorted(files):
+                if re.match(r".*cleanieeg\.dat.*", f):
+                    kind = 1
+                elif re.match(r".*ieeg\.dat.*", f):
+                    kind = 0
+                else:
+                    continue
+                # index the file under each of its parent directories
+                for i in range(len(parts) + 1):
+                    pair = self.dat.setdefault(op.join(*parts[:i], ''),
+                                               [None, None])
+                    if pair[kind] is None:
+                        pair[kind] = op.join(self.root, rel, f)
+
+    def find_dat(self, folder: PathLike) -> (PathLike, PathLike):
+        """Looks up the .dat files in a folder, see :func:`find_dat`"""
+        rel = op.relpath(op.join(self.root, folder), self.root)
+        pair = self.dat.get(op.join(rel, '') if rel != '.' else '',
+                            [None, None])
+        if None in pair:
+            raise FileNotFoundError("Not all .dat files were found:")
+        return tuple(pair)
+
+    def bids_root(self, task: str) -> str:
+        """Looks up the BIDS root of a task, see :func:`get_data`"""
+        if task in self.bids:
+            return self.bids[task]
+        for key, root in self.bids.items():
+            if key.startswith(task):
+                return root
+        raise FileNotFoundError("Could not find BIDS directory in {} for task "
+                                "{}".format(self.root, task))
+
+    def recon_file(self, subject: str, name: str) -> str:
+        """Looks up a file in the elec_recon folder of a subject"""
+        try:
+            return self.recon[subject][name]
+        except KeyError:
+            raise FileNotFoundError(f"{name} not found in {subject} "
+                                    f"elec_recon of {self.root}") from None
+
+    def records(self) -> pd.DataFrame:
+        """All recorded files with their size and modification time.
+
+        Returns
+        -------
+        pd.DataFrame
+            The path, size in bytes and mtime in nanoseconds of each file.
+        """
+        rows = [(op.join(self.root, rel, f), *st)
+                for rel, entry in self.dirs.items()
+                for f, st in entry['files'].items()]
+        return pd.DataFrame(rows, columns=['path', 'size', 'mtime'])
+
+
 @fill_doc
 @verbose
 def save_derivative(inst: Signal, layout: BIDSLayout, pipeline: str = None,
                     overwrite: bool = False, format: str = 'EDF',
-                    anonymize: bool = True, verbose=None):
+                    anonymize: bool = True, n_jobs: int = 1, verbose=None):
     """Save an intermediate data instance from a pipeline to a BIDS folder.
 
+    Each run (delimited by 'BAD boundary' annotations) is written to its own
+    file. For preloaded data the runs are built from views of the data
+    instead of copies.
+
     Parameters
     ----------
     inst : Signal
@@ -208,16 +654,24 @@ def save_derivative(inst: Signal, layout: BIDSLayout, pipeline: str = None,
         The name of the pipeline.
     %(overwrite)s
     format : str
-        The format to save the data in. Defaults to EDF.
+        The format to save the data in. Defaults to EDF. 'FIF' saves lossless
+        float32 FIF files with BIDS sidecars, which are much faster to write
+        and to read back with :func:`raw_from_layout` than EDF.
+    anonymize : bool
+        Whether to anonymize the data, by default True
+    n_jobs : int
+        The number of threads used to write runs concurrently when format is
+        'FIF', by default 1. EDF runs are always written sequentially since
+        :func:`mne_bids.write_raw_bids` updates files shared between runs.
     %(verbose)s
     """
     save_dir = op.join(layout.root, "derivatives", pipeline)
-    if not op.isdir(save_dir):
-        mkdir(save_dir)
+    makedirs(save_dir, exist_ok=True)
     bounds = inst.annotations.copy()
     bounds = bounds[np.where(bounds.description == 'BAD boundary')[0]]
     bounds = [0] + list(bounds.onset) + [inst.times[-1]]
-    for i, file in enumerate(inst.filenames):
+
+    def write(i, file):
         entities = parse_file_entities(file)
         if 'desc' in entities.keys():
             entities['description'] = entities.pop('desc')
@@ -229,19 +683,76 @@ def save_derivative(inst: Signal, layout: BIDSLayout, pipeline: str = None,
         if pipeline:
             entities['description'] = pipeline
         bids_path = BIDSPath(**entities, root=save_dir)
-        run = inst.copy().crop(tmin=bounds[i], tmax=bounds[i + 1])
+        last = i == len(inst.filenames) - 1
+        run = _crop_view(inst, bounds[i], bounds[i + 1], include_tmax=last)
+        # the boundaries are added back when the runs are concatenated
+        run.annotations.delete(np.where(np.isin(
+            run.annotations.description, ['BAD boundary', 'EDGE boundary']
+        ))[0])
         if anonymize:
-            if isinstance(run, Signal):
-                run.anonymize()
-                anonymize = None
-            else:
-                anonymize = {'daysback': 10000000}
+            run.anonymize()
+
+        if format.upper() == 'FIF':
+            _write_fif(run, bids_path, overwrite)
         else:
-            anonymize = None
+            write_raw_bids(run, bids_path, allow_preload=True, format=format,
+                           acpc_aligned=True, overwrite=overwrite,
+                           anonymize=None, verbose=verbose)
+
+    if format.upper() == 'FIF':
+        if not op.isfile(op.join(save_dir, "dataset_description.json")):
+            make_dataset_description(path=save_dir, name=pipeline,
+                                     dataset_type='derivative',
+                                     generated_by=[{'Name': pipeline}],
+                                     verbose=False)
+        n_jobs = _thread_count(n_jobs, len(inst.filenames))
+    else:
+        n_jobs = 1
+    with ThreadPoolExecutor(n_jobs) as pool:
+        list(pool.map(write, range(len(inst.filenames)), inst.filenames))
 
-        write_raw_bids(run, bids_path, allow_preload=True, format=format,
-                       acpc_aligned=True, overwrite=overwrite,
-                       anonymize=anonymize, verbose=verbose)
+
+def _crop_view(raw: mne.io.BaseRaw, tmin: float, tmax: float,
+               include_tmax: bool = True) -> mne.io.BaseRaw:
+    """Crop a raw instance without copying its data.
+
+    Equivalent to ``raw.copy().crop(tmin, tmax, include_tmax)``, but a
+    preloaded instance is wrapped in a RawArray over a read-only view of the
+    cropped samples.
+    """
+    if not raw.preload:
+        return raw.copy().crop(tmin=tmin, tmax=tmax,
+                               include_tmax=include_tmax)
+    start, stop = raw.time_as_index([tmin, tmax], use_rounding=True)
+    data = raw._data[:, start:stop + include_tmax]
+    data.flags.writeable = False
+    run = mne.io.RawArray(data, raw.info.copy(),
+                          first_samp=raw.first_samp + start, verbose=False)
+    annot = raw.annotations.copy()
+    if annot.orig_time is None:
+        annot.onset -= start / raw.info['sfreq']
+    run.set_annotations(annot, emit_warning=False)
+    return run
+
+
+def _write_fif(raw: mne.io.BaseRaw, bids_path: BIDSPath, overwrite: bool):
+    """Write a run as float32 FIF with its channels.tsv and json sidecars.
+
+    :func:`mne_bids.write_raw_bids` saves FIF in the original (float64)
+    format of a RawArray and rewrites the dataset level files on every call,
+    so the sidecars are written with the mne_bids writers instead; the
+    mne-bids version is pinned in the requirements for these.
+    """
+    bids_path = bids_path.copy().update(suffix='ieeg', extension='.fif',
+                                        datatype='ieeg')
+    bids_path.mkdir()
+    raw.save(bids_path.fpath, fmt='single', overwrite=overwrite,
+             split_naming='bids', verbose=False)
+    _channels_tsv(raw, bids_path.copy().update(suffix='channels',
+                                               extension='.tsv'), overwrite)
+    _sidecar_json(raw, bids_path.task, 'n/a',
+                  bids_path.copy().update(extension='.json'), 'ieeg',
+                  overwrite=overwrite)
 
 
 def get_bad_chans(fname: str):
@@ -289,29 +800,97 @@ def update(filename: PathLike, channels: list[str],
 
 
 @update.register
-def _(inst: mne.io.base.BaseRaw,
-      layout: BIDSLayout, description: list[str] | str = None, verbose=None):
-    if not hasattr(inst, 'filenames'):
-        inst.filenames = inst.info['subject_info'].get('files', None)
-    for i, file in enumerate(inst.filenames):
-        fname = op.join(layout.root, file)
-        update(fname, inst.info['bads'], description=description, status='bad',
-               verbose=verbose)
-        goods = [ch for ch in inst.ch_names if ch not in inst.info['bads']]
-        update(fname, channels=goods, status='good', verbose=None)
+def _(inst: mne.io.base.BaseRaw, layout: BIDSLayout,
+      description: list[str] | str = None, n_jobs: int = 1, verbose=None):
+    _update_inst(inst, layout, description, n_jobs, verbose)
 
 
 @update.register
-def _(inst: mne.time_frequency.BaseTFR,
-      layout: BIDSLayout, description: list[str] | str = None, verbose=None):
+def _(inst: mne.time_frequency.BaseTFR, layout: BIDSLayout,
+      description: list[str] | str = None, n_jobs: int = 1, verbose=None):
+    _update_inst(inst, layout, description, n_jobs, verbose)
+
+
+def _update_inst(inst, layout: BIDSLayout, description, n_jobs: int,
+                 verbose=None):
     if not hasattr(inst, 'filenames'):
         inst.filenames = inst.info['subject_info'].get('files', None)
-    for i, file in enumerate(inst.filenames):
-        fname = op.join(layout.root, file)
-        update(fname, inst.info['bads'], description=description, status='bad',
-               verbose=verbose)
-        goods = [ch for ch in inst.ch_names if ch not in inst.info['bads']]
-        update(fname, channels=goods, status='good', verbose=None)
+    bads = inst.info['bads']
+    if isinstance(description, str) or description is None:
+        description = [description] * len(bads)
+    statuses = {ch: 'good' for ch in inst.ch_names if ch not in bads}
+    statuses.update({ch: ('bad', desc) for ch, desc in zip(bads, description)})
+    update_channels({op.join(layout.root, f): statuses
+                     for f in inst.filenames}, n_jobs, verbose=verbose)
+
+
+@fill_doc
+@verbose
+def update_channels(statuses: dict[PathLike, dict[str, str | tuple]],
+                    n_jobs: int = 1, verbose=None):
+    """Updates the channel statuses of many recordings at once
+
+    Each channels.tsv sidecar is read and written exactly once, no matter how
+    many channels or files refer to it.
+
+    Parameters
+    ----------
+    statuses : dict[PathLike, dict[str, str | tuple[str, str]]]
+        Mapping of recording file to a mapping of channel name to its status,
+        either 'good' or 'bad', or a tuple of status and description.
+    n_jobs : int, optional
+        The number of sidecars to update concurrently, by default 1
+    %(verbose)s
+
+    Examples
+    --------
+    >>> update_channels({
+    ...     'sub-D0001/ieeg/sub-D0001_task-test_ieeg.edf': {
+    ...         'LAM1': ('bad', 'outlier round 1'), 'LAM2': 'good'},
+    ...     'sub-D0002/ieeg/sub-D0002_task-test_ieeg.edf': {
+    ...         'RPI3': 'bad'}}) # doctest: +SKIP
+    """
+    # group the files by sidecar so split files share one read and write
+    sidecars = {}
+    for fname, chans in statuses.items():
+        sidecars.setdefault(_channels_fname(fname), {}).update(chans)
+
+    def write(fname: str, chans: dict):
+        data = _from_tsv(fname)
+        n_chans = len(data['name'])
+        data.setdefault('status', ['good'] * n_chans)
+        data.setdefault('status_description', ['n/a'] * n_chans)
+        index = {name: i for i, name in enumerate(data['name'])}
+        for ch, status in chans.items():
+            desc = None
+            if not isinstance(status, str):
+                status, desc = status
+            if status not in ('good', 'bad'):
+                raise ValueError(f"Status of channel {ch} must be 'good' or "
+                                 f"'bad', got {status}")
+            if ch not in index:
+                raise ValueError(f"Channel {ch} not found in {fname}")
+            data['status'][index[ch]] = status
+            if desc is not None:
+                data['status_description'][index[ch]] = desc
+        mne.utils.logger.info(f"Updating channel statuses in {fname}")
+        pd.DataFrame(data).to_csv(fname, sep='\t', index=False,
+                                  lineterminator='\n')
+
+    n_jobs = _thread_count(n_jobs, len(sidecars))
+    with ThreadPoolExecutor(n_jobs) as pool:
+        list(pool.map(write, sidecars.keys(), sidecars.values()))
+
+
+def _channels_fname(fname: PathLike) -> str:
+    """Finds the channels.tsv sidecar of a recording file."""
+    bids_path = get_bids_path_from_fname(fname)
+    out = bids_path.copy().update(split=None, suffix='channels',
+                                  extension='.tsv').fpath
+    if not op.isfile(out):
+        out = bids_path.find_matching_sidecar(suffix='channels',
+                                              extension='.tsv')
+    return str(out)
 
 
 def get_elec_volume_labels(subj: str, subj_dir: str, radius: int = 10,
@@ -334,6 +913,13 @@ def get_elec_volume_labels(subj: str, subj_dir: str, radius: int = 10,
     pd.DataFrame
         The labels of the electrode volume.
     """
+    filename = _elec_labels_fname(subj, subj_dir, radius, atlas)
+    out = pd.read_csv(filename, header=None, skiprows=1, index_col=1)
+    return out
+
+
+def _elec_labels_fname(subj: str, subj_dir: str, radius: int,
+                       atlas: str) -> str:
     filename = op.join(subj_dir, subj, "elec_recon",
                        f"{subj}_elec_location_radius_{radius}mm_aparc{atlas}+"
                        f"aseg.mgz")
@@ -341,5 +927,162 @@ def get_elec_volume_labels(subj: str, subj_dir: str, radius: int = 10,
         filename += "_brainshifted.csv"
     else:
         filename += ".csv"
-    out = pd.read_csv(filename, header=None, skiprows=1, index_col=1)
-    return out
+    return filename
+
+
+class ElecLabels:
+    """Parsed electrode volume labels of a subject.
+
+    Stores the candidate labels of each electrode as integer codes into a
+    vocabulary of label names, alongside their probabilities, so that label
+    queries run on arrays instead of strings.
+
+    Parameters
+    ----------
+    names : np.ndarray
+        The channel names, shape (n_channels,).
+    vocab : np.ndarray
+        The unique label names.
+    codes : np.ndarray
+        Index into ``vocab`` of each label, shape (n_channels, n_labels).
+        The first column is the most likely label, and -1 marks no label.
+    probs : np.ndarray
+        The probability of each label, shape (n_channels, n_labels).
+
+    Examples
+    --------
+    >>> labels = ElecLabels(np.array(['A1', 'A2']), np.array(
+    ...     ['Unknown', 'G_front', 'Left-Cerebral-White-Matter', 'S_temp']),
+    ...     np.array([[1, 2, 3], [0, 2, 3]]),
+    ...     np.array([[1., .5, .3], [1., .9, .04]]))
+    >>> labels.first_label()
+    array(['G_front', 'Unknown'], dtype='<U26')
+    >>> labels.first_label(['A2'], threshold=0.01)
+    array(['S_temp'], dtype='<U26')
+    """
+
+    bad_words = ('Unknown', 'unknown', 'hypointensities', 'White-Matter')
+
+    def __init__(self, names: np.ndarray, vocab: np.ndarray,
+                 codes: np.ndarray, probs: np.ndarray):
+        self.names = np.asarray(names)
+        self.vocab = np.asarray(vocab)
+        self.codes = np.asarray(codes)
+        self.probs = np.asarray(probs)
+        self.index = {n: i for i, n in enumerate(self.names)}
+
+    @classmethod
+    def from_csv(cls, filename: PathLike) -> 'ElecLabels':
+        """Parses an electrode location csv file.
+
+        Each row holds the most likely label, the channel name, and then
+        pairs of candidate labels and probabilities.
+        """
+        with open(filename, newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        n_labels = max(len(r) // 2 for r in rows)
+        vocab = {}
+        codes = np.full((len(rows), n_labels), -1, dtype=np.int32)
+        probs = np.zeros((len(rows), n_labels), dtype=np.float32)
+        for i, row in enumerate(rows):
+            pairs = [(row[0], None)] + list(zip(row[2::2], row[3::2]))
+            for j, (label, prob) in enumerate(pairs):
+                if not label.strip():
+                    break
+                codes[i, j] = vocab.setdefault(label, len(vocab))
+                probs[i, j] = np.nan if prob is None else float(prob)
+        return cls(np.array([r[1] for r in rows]), np.array(list(vocab)),
+                   codes, probs)
+
+    @classmethod
+    def load(cls, filename: PathLike) -> 'ElecLabels':
+        """Loads the labels of a csv file, parsing it only if it changed.
+
+        The parsed labels are kept in memory and persisted next to the csv
+        file, keyed on its size and modification time.
+        """
+        st = stat(filename)
+        return _load_elec_labels(str(filename), (st.st_mtime_ns, st.st_size))
+
+    def save(self, filename: PathLike, stamp: tuple[int, int] = (0, 0)):
+        np.savez(filename, names=self.names, vocab=self.vocab,
+                 codes=self.codes, probs=self.probs, stamp=np.array(stamp))
+
+    def first_label(self, picks: list[str] = None,
+                    threshold: float = 0.05) -> np.ndarray:
+        """Gets the first label of each channel that is not white matter.
+
+        The most likely label is used unless it is white matter or unknown,
+        in which case the first candidate label that is neither and has a
+        probability above the threshold is used instead. If there is no such
+        label, the most likely label is returned.
+
+        Parameters
+        ----------
+        picks : list[str], optional
+            The channels to get labels for, by default all channels
+        threshold : float, optional
+            The minimum probability of a candidate label, by default 0.05
+
+        Returns
+        -------
+        np.ndarray
+            The label of each channel.
+        """
+        rows = slice(None) if picks is None else \
+            [self.index[p] for p in picks]
+        codes, probs = self.codes[rows], self.probs[rows]
+        exact = np.isin(self.vocab, self.bad_words)
+        partial = np.array([any(w in v for w in self.bad_words)
+                            for v in self.vocab], dtype=bool)
+
+        # candidates stop at the first empty label
+        valid = np.logical_and.accumulate(codes[:, 1:] >= 0, axis=1)
+        ok = valid & ~partial[codes[:, 1:]] & (probs[:, 1:] > threshold)
+        first = np.argmax(ok, axis=1) + 1
+        use = ~exact[codes[:, 0]] | ~ok.any(axis=1)
+        out = np.where(use, codes[:, 0],
+                       np.take_along_axis(codes, first[:, None], 1)[:, 0])
+        return self.vocab[out]
+
+
+@lru_cache(maxsize=256)
+def _load_elec_labels(filename: str, stamp: tuple[int, int]) -> ElecLabels:
+    cache = op.splitext(filename)[0] + "_labels.npz"
+    if op.isfile(cache):
+        with np.load(cache) as f:
+            if tuple(f['stamp']) == stamp:
+                return ElecLabels(f['names'], f['vocab'], f['codes'],
+                                  f['probs'])
+    labels = ElecLabels.from_csv(filename)
+    try:
+        labels.save(cache, stamp)
+    except OSError:  # read only subjects directory
+        pass
+    return labels
+
+
+def elec_volume_labels(subj: str, subj_dir: str, radius: int = 10,
+                       atlas: str = ".a2009s") -> ElecLabels:
+    """Gets the parsed electrode volume labels for a subject.
+
+    Unlike :func:`get_elec_volume_labels`, the parsed labels are cached in
+    memory and on disk, so repeated calls only parse the csv file once.
+
+    Parameters
+    ----------
+    subj : str
+        The subject to get the labels for.
+    subj_dir : str
+        The directory of the subject.
+    radius : int, optional
+        The radius of the volume, by default 10
+    atlas : str, optional
+        The atlas to use, by default ".a2009s"
+
+    Returns
+    -------
+    ElecLabels
+        The labels of the electrode volume.
+    """
+    return ElecLabels.load(_elec_labels_fname(subj, subj_dir, radius, atlas))
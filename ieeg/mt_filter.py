@@ -1,24 +1,31 @@
 import argparse
+import logging
+import os
+from tempfile import mkstemp
 from typing import Union
 
 import numpy as np
-from mne.io import pick
+from joblib import Parallel, delayed, effective_n_jobs
+from mne.io import BaseRaw, pick
 from mne.utils import fill_doc, logger, verbose
+from tqdm import tqdm
 
 from ieeg import ListNum
-from ieeg.process import proc_array
+from ieeg.process import cache_result
 from ieeg.timefreq import utils as mt_utils
 from ieeg.timefreq.multitaper import WindowingRemover
 
 
 @fill_doc
+@cache_result
 @verbose
 def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
                 filter_length: str = '10s', notch_widths: ListNum = 10.,
                 mt_bandwidth: float = None, p_value: float = 0.05,
                 picks: list[Union[int, str]] = None, n_jobs: int = None,
                 adaptive: bool = True, low_bias: bool = True,
-                copy: bool = True, *, verbose: Union[int, bool, str] = None
+                copy: bool = True, memmap: Union[str, bool] = True, *,
+                n_detect: int = None, verbose: Union[int, bool, str] = None
                 ) -> mt_utils.Signal:
     """Apply a multitaper line noise notch filter for the signal instance.
 
@@ -59,6 +66,8 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
         justified.
     %(picks_all)s
     %(n_jobs)s
+        A Raw that is not preloaded is filtered in a single process, with
+        this many threads for each FFT.
     adaptive : bool, optional
         Use adaptive weights to combine the tapered spectra into PSD.
         Default is True.
@@ -68,6 +77,21 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
     copy : bool, optional
         If True, a copy of x, filtered, is returned. Otherwise, it operates
         on x in place.
+    memmap : str | bool, optional
+        Only used for a Raw that is not preloaded, which is read and filtered
+        one filter length at a time, so that memory use does not depend on
+        the recording duration. The filtered data is written to a memory-mapped
+        file at this path, which is kept after the returned Raw is deleted,
+        or to a temporary file if True, which is deleted along with the
+        returned Raw. If False, the filtered data is kept in memory. Default
+        is True.
+    n_detect : int, optional
+        If given, the line components of each channel are detected once, on
+        this many evenly spaced windows of the data, and every window is then
+        cleaned of those components by a single tapered FFT, without the
+        F-test. This is much faster for long recordings in which the line
+        noise is stable. The deviation from the full method on the detection
+        windows is logged. Default is None, which tests every window.
     %(verbose)s
 
     Returns
@@ -124,8 +148,13 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
     else:
         filt = raw
 
-    x = filt.get_data("data")
-    x = mt_utils._check_filterable(x, 'notch filtered', 'notch_filter')
+    stream = isinstance(filt, BaseRaw) and not filt.preload
+    if stream:
+        n_times = filt.n_times
+    else:
+        x = filt.get_data("data")
+        x = mt_utils._check_filterable(x, 'notch filtered', 'notch_filter')
+        n_times = x.shape[-1]
     if freqs is not None:
         freqs = np.atleast_1d(freqs)
         # Only have to deal with notch_widths for non-autodetect
@@ -146,31 +175,100 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
 
     # convert filter length to samples
     if filter_length is None:
-        filter_length = x.shape[-1]
+        filter_length = n_times
 
-    filter_length: int = min(mt_utils.to_samples(filter_length, fs),
-                             x.shape[-1])
+    filter_length: int = min(mt_utils.to_samples(filter_length, fs), n_times)
 
     process = WindowingRemover(fs, freqs, notch_widths, filter_length,
-                               adaptive, low_bias, mt_bandwidth, p_value)
+                               adaptive, low_bias, mt_bandwidth, p_value,
+                               n_detect, effective_n_jobs(n_jobs) if stream
+                               else 1)
 
-    filt._data[data_idx] = mt_spectrum_proc(x, process, picks, n_jobs)
+    if stream:
+        _stream_filter(filt, data_idx, process, picks, memmap)
+    else:
+        filt._data[data_idx] = mt_spectrum_proc(x, process, picks, n_jobs,
+                                                verbose=verbose)
 
     return filt
 
 
+def _stream_filter(raw: BaseRaw, data_idx: np.ndarray,
+                   process: WindowingRemover, picks: list,
+                   memmap: Union[str, bool]):
+    """Filter a Raw that is not loaded, one filter length at a time.
+
+    Chunks are read from disk and fed through the overlap-add processor of
+    ``process``, and the output is written to a (memory-mapped) buffer that
+    becomes the data of the Raw.
+    """
+    rows = data_idx[pick._picks_to_idx(len(data_idx), picks)]
+    shape = (raw.info['nchan'], raw.n_times)
+    temp = memmap is True
+    if temp:
+        fd, memmap = mkstemp(suffix='-filt.dat')
+        os.close(fd)
+    if memmap:
+        out = np.memmap(memmap, np.float64, 'w+', shape=shape)
+    else:
+        out = np.empty(shape)
+    idx = [0]
+
+    def store(x_):
+        stop = idx[0] + x_.shape[-1]
+        out[rows, idx[0]:stop] = x_
+        idx[0] = stop
+
+    if process.n_detect:
+        process.detect(lambda start, stop: raw.get_data(
+            rows, start=start, stop=stop), raw.n_times)
+    cola = process.cola(raw.n_times, store)
+    for start in range(0, raw.n_times, process.filter_length):
+        stop = min(start + process.filter_length, raw.n_times)
+        chunk = raw.get_data(start=start, stop=stop)
+        # unfiltered channels are copied, filtered ones are overwritten
+        out[:, start:stop] = chunk
+        cola.feed(chunk[rows])
+    assert idx[0] == raw.n_times
+    process.report()
+
+    if memmap:
+        out.flush()
+        if not temp:
+            # mne deletes the file of a memmap along with the Raw, so a file
+            # given by path is kept by only handing it a plain array view
+            out = out.view(np.ndarray)
+    raw._data = out
+    raw.preload = True
+
+
+@verbose
 def mt_spectrum_proc(x: np.ndarray, process: callable, picks: list,
-                     n_jobs: int) -> np.ndarray:
-    """Call _mt_spectrum_remove."""
+                     n_jobs: int, verbose=None) -> np.ndarray:
+    """Call _mt_spectrum_remove on blocks of channels.
+
+    A progress bar over the blocks is shown when logging at the info level.
+    """
     # set up array for filtering, reshape to 2D, operate on last axis
     x, orig_shape, picks = _prep_for_filtering(x, picks)
 
-    proc_array(process, x, n_jobs=n_jobs, desc="Channels")
+    # split the picked channels into blocks that are processed together
+    n_blocks = max(effective_n_jobs(n_jobs), -(-len(picks) // _CHANNEL_BLOCK))
+    blocks = [b for b in np.array_split(picks, n_blocks) if b.size]
+    gen = Parallel(n_jobs, return_as='generator')(
+        delayed(process)(x[block]) for block in blocks)
+    gen = tqdm(gen, desc="Channels", total=len(blocks), unit='block',
+               disable=not logger.isEnabledFor(logging.INFO))
+    for out, block in zip(gen, blocks):
+        x[block] = out
 
     x.shape = orig_shape
     return x
 
 
+_CHANNEL_BLOCK = 32  # maximum channels per multitaper batch
+
+
 def _prep_for_filtering(x: np.ndarray, picks: list = None
                         ) -> tuple[np.ndarray, tuple, int]:
     """Set up array as 2D for filtering ease."""
@@ -1,12 +1,14 @@
 import mne
 import numpy as np
 from bids import BIDSLayout
+from mne._fiff.pick import _picks_to_idx
+from mne.annotations import _sync_onset
 from mne.utils import fill_doc, verbose
 from scipy.signal import detrend
 
 from ieeg import Doubles, Signal
 from ieeg.calc import stats
-from ieeg.io import update
+from ieeg.io import update_channels
 from ieeg.timefreq.utils import to_samples
 
 
@@ -81,17 +83,41 @@ def crop_empty_data(raw: mne.io.Raw, bound: str = 'boundary',
         t_max = no_bound.onset[-1] + end_pad
 
         # create new cropped raw file
-        crop_list.append(raw.copy().crop(tmin=t_min, tmax=t_max))
+        crop_list.append(_crop_shared(raw, t_min, t_max))
 
-    return mne.concatenate_raws(crop_list)
+    out = mne.concatenate_raws(crop_list)
+    if out.preload and np.shares_memory(out._data, raw._data):
+        out._data = out._data.copy()
+    return out
+
+
+def _crop_shared(raw: mne.io.BaseRaw, tmin: float, tmax: float
+                 ) -> mne.io.BaseRaw:
+    """Crops a copy of raw whose data is a view of the original data.
+
+    Only the metadata is copied, so cropping many blocks out of a preloaded
+    recording costs no more memory than the recording itself. The output must
+    not be modified in place.
+    """
+    if not raw.preload:
+        return raw.copy().crop(tmin=tmin, tmax=tmax)
+    data = raw._data
+    raw._data = data[:, :0]  # so that neither copy nor crop copy the data
+    try:
+        out = raw.copy().crop(tmin=tmin, tmax=tmax)
+    finally:
+        raw._data = data
+    start = out.first_samp - raw.first_samp
+    out._data = data[:, start:start + out.n_times]
+    return out
 
 
 @fill_doc
 @verbose
 def channel_outlier_marker(input_raw: Signal, outlier_sd: float = 3,
                            max_rounds: int = np.inf, axis: int = 0,
-                           save: bool = False, verbose: bool = True
-                           ) -> list[str]:
+                           save: bool = False, chunk_size: int | str = None,
+                           verbose: bool = True) -> list[str]:
     """Identify bad channels by variance.
 
     Parameters
@@ -108,6 +134,11 @@ def channel_outlier_marker(input_raw: Signal, outlier_sd: float = 3,
         Axis to calculate variance over, by default 0
     save : bool, optional
         Whether to save bad channels to raw.info['bads'], by default False
+    chunk_size : int | str, optional
+        If given, read the Raw this many samples (or this long, e.g. '60s') at
+        a time and stream the detrended variance of each channel instead of
+        loading and detrending a full copy of the data. Works with
+        ``preload=False``. By default None
     %(verbose)s
 
     Returns
@@ -133,14 +164,28 @@ def channel_outlier_marker(input_raw: Signal, outlier_sd: float = 3,
     outlier round 2 channels: ['AST2', 'RQ2', 'N/A', 'G32', 'AD3', 'PD4']
     """
 
-    tmp = input_raw.copy()
-    data = detrend(tmp.get_data('data'))  # channels X time
-    names = tmp.pick('data').ch_names
+    if chunk_size is not None:
+        if not isinstance(input_raw, mne.io.BaseRaw):
+            raise TypeError("chunk_size is only supported for Raw instances")
+        picks = _picks_to_idx(input_raw.info, 'data', exclude=())
+        names = [input_raw.ch_names[p] for p in picks]
+        step = to_samples(chunk_size, input_raw.info['sfreq']) if \
+            isinstance(chunk_size, str) else int(chunk_size)
+        n_times = input_raw.n_times
+        sig = stats.detrended_power_std(
+            lambda start, stop: input_raw.get_data(picks, start, stop),
+            n_times, step)
+        outliers = stats.sig_outliers(sig, outlier_sd, max_rounds)
+    else:
+        tmp = input_raw.copy()
+        data = detrend(tmp.get_data('data'))  # channels X time
+        names = tmp.pick('data').ch_names
+        outliers = stats.outlier_repeat(data, outlier_sd, max_rounds, axis)
     bads = []  # output for bad channel names
     desc = []  # output for bad channel descriptions
 
     # Pop out names to bads output using comprehension list
-    for ind, i in stats.outlier_repeat(data, outlier_sd, max_rounds, axis):
+    for ind, i in outliers:
         bads.append(names[ind])
         desc.append(f'outlier round {i} more than {outlier_sd} SDs above mean')
         # log channels excluded per round
@@ -148,21 +193,29 @@ def channel_outlier_marker(input_raw: Signal, outlier_sd: float = 3,
             mne.utils.logger.info(f'outlier round {i} channels: {bads}')
 
     if save:
-        if not hasattr(tmp, 'filenames'):
+        if not hasattr(input_raw, 'filenames'):
             raise ValueError("Raw instance must have filenames attribute to "
                              "save bad channels")
-        for file in tmp.filenames:
-            update(file, bads, desc)
+        statuses = {ch: ('bad', d) for ch, d in zip(bads, desc)}
+        update_channels({file: statuses for file in input_raw.filenames})
 
     return bads
 
 
+_OUTLIER_BATCH = 64  # trials per pass when searching for outliers
+
+
 @verbose
 def outliers_to_nan(trials: mne.epochs.BaseEpochs, outliers: float,
                     copy: bool = False, picks: list = 'data',
-                    verbose=None) -> mne.epochs.BaseEpochs:
+                    return_mask: bool = False, verbose=None
+                    ) -> mne.epochs.BaseEpochs | np.ndarray[bool]:
     """Set outliers to nan.
 
+    Only the rejected (trial, channel) rows of the data are overwritten, in
+    place. With ``return_mask`` the data are left untouched and the boolean
+    keep mask is returned instead.
+
     Parameters
     ----------
     trials : mne.epochs.BaseEpochs
@@ -174,11 +227,15 @@ def outliers_to_nan(trials: mne.epochs.BaseEpochs, outliers: float,
         Whether to copy the data, by default False
     picks : list, optional
         The channels to remove outliers from, by default 'data'
+    return_mask : bool, optional
+        Whether to return the keep mask, of shape (n_trials, n_picks), instead
+        of setting outliers to nan, by default False
 
     Returns
     -------
-    mne.epochs.BaseEpochs
-        The trials with outliers set to nan.
+    mne.epochs.BaseEpochs | np.ndarray[bool]
+        The trials with outliers set to nan, or the keep mask with True for
+        the trials of each channel that are not outliers.
 
     Examples
     --------
@@ -207,26 +264,169 @@ def outliers_to_nan(trials: mne.epochs.BaseEpochs, outliers: float,
            [-0.00033708, -0.00028005, -0.00020934, ..., -0.00040934,
             -0.00042341, -0.00040973]])
     """
-    if copy:
+    if copy and not return_mask:
         trials = trials.copy()
-    picks = mne.io.pick._picks_to_idx(trials.info, picks)
+    picks = mne.io.pick._picks_to_idx(trials.info, picks, allow_empty=True)
+    if len(picks) == 0:
+        if return_mask:
+            return np.ones((len(trials), 0), dtype=bool)
+        return trials
     trials.load_data()
-    data = trials.get_data(picks=picks, verbose=verbose)
+
+    # a contiguous set of picks can be read as a view of the data
+    if np.array_equal(picks, np.arange(picks[0], picks[-1] + 1)):
+        data = trials._data[:, picks[0]:picks[-1] + 1]
+    else:
+        data = trials._data[:, picks]
 
     # bool array of where to keep data trials X channels
-    keep = stats.find_outliers(data, outliers)
+    keep = stats.find_outliers(data, outliers, batch_size=_OUTLIER_BATCH)
+    if return_mask:
+        return keep
 
-    # set outliers to nan if not keep
-    data = np.where(keep[..., None], data, np.nan)
-    trials._data[:, picks] = data
+    # set outliers to nan if not keep, without writing to a shared view
+    trial, ch = np.nonzero(~keep)
+    if trial.size and not trials._data.flags.writeable:
+        trials._data = trials._data.copy()
+    trials._data[trial, picks[ch]] = np.nan
 
     return trials
 
 
+class EpochsView(mne.EpochsArray):
+    """Epochs of a preloaded Raw that share its memory.
+
+    When the trials are evenly spaced and the picked channels are evenly
+    spaced too (e.g. contiguous), the (trials X channels X time) data is a
+    read-only strided view of the Raw, so overlapping windows are not
+    duplicated. Otherwise the trials are copied once, as with
+    ``mne.Epochs(preload=True)``. Being :class:`mne.EpochsArray`, the view
+    works with every step that takes Epochs. Cropping keeps it a view, while
+    selecting trials copies them. Steps that modify the data in place must
+    replace a read-only ``_data`` with a copy first, as
+    :func:`outliers_to_nan` does, so the Raw is never written to.
+
+    Parameters
+    ----------
+    raw : mne.io.BaseRaw
+        The preloaded raw data to epoch.
+    events : np.ndarray
+        The events array, shape (n_events, 3).
+    event_id : dict[str, int]
+        The event ids to epoch around.
+    tmin : float
+        The start of the window relative to the event, in seconds.
+    tmax : float
+        The end of the window relative to the event, in seconds.
+    picks : str | list | slice | None, optional
+        The channels to include, by default all channels.
+    reject_by_annotation : bool, optional
+        Whether to drop windows overlapping 'bad' annotations, by default True
+
+    Examples
+    --------
+    >>> info = mne.create_info(2, 10., 'seeg')
+    >>> raw = mne.io.RawArray(np.arange(60.).reshape(2, 30), info,
+    ...                       verbose=False)
+    >>> events = np.array([[2, 0, 1], [5, 0, 2], [8, 0, 1]])
+    >>> epochs = EpochsView(raw, events, {'a': 1, 'b': 2}, 0, 0.3)
+    >>> epochs['a'].get_data(copy=True)
+    array([[[ 2.,  3.,  4.,  5.],
+            [32., 33., 34., 35.]],
+    <BLANKLINE>
+           [[ 8.,  9., 10., 11.],
+            [38., 39., 40., 41.]]])
+    >>> np.shares_memory(epochs.get_data(copy=False), raw._data)
+    True
+    >>> epochs.average().data
+    array([[ 5.,  6.,  7.,  8.],
+           [35., 36., 37., 38.]])
+    """
+
+    def __init__(self, raw: mne.io.BaseRaw, events: np.ndarray,
+                 event_id: dict[str, int], tmin: float, tmax: float,
+                 picks=None, reject_by_annotation: bool = True):
+        if not raw.preload:
+            raise ValueError("EpochsView requires preloaded data")
+        sfreq = raw.info['sfreq']
+        first, last = round(tmin * sfreq), round(tmax * sfreq)
+        n_times = last - first + 1
+        picks = _picks_to_idx(raw.info, picks, 'all', exclude=())
+
+        # keep the events inside the data and outside of bad annotations
+        selection = np.flatnonzero(np.isin(events[:, 2],
+                                           list(event_id.values())))
+        events = events[selection]
+        starts = events[:, 0] + first - raw.first_samp
+        good = (starts >= 0) & (starts + n_times <= raw.n_times)
+        if reject_by_annotation and len(raw.annotations):
+            annot = raw.annotations
+            bad = np.char.startswith(np.char.lower(
+                annot.description.astype(str)), 'bad')
+            onset = _sync_onset(raw, annot.onset[bad]) * sfreq
+            end = onset + annot.duration[bad] * sfreq
+            good &= ~np.any((onset < (starts + n_times)[:, None]) &
+                            (end > starts[:, None]), axis=1)
+        starts = starts[good]
+
+        chans = _as_slice(picks)
+        trials = _as_slice(starts)
+        if chans is not None and trials is not None:
+            # (trials X channels X time) strides of the continuous data
+            arr = raw._data[chans]
+            data = np.lib.stride_tricks.as_strided(
+                arr[:, trials.start:], (starts.size, arr.shape[0], n_times),
+                (trials.step * arr.strides[1], arr.strides[0],
+                 arr.strides[1]), writeable=False)
+        else:
+            windows = np.lib.stride_tricks.sliding_window_view(
+                raw._data, n_times, axis=-1)
+            data = windows[picks][:, starts].transpose(1, 0, 2)
+        super().__init__(data, mne.pick_info(raw.info, picks), events[good],
+                         first / sfreq, event_id, on_missing='ignore',
+                         selection=selection[good], verbose=False)
+
+    @verbose
+    def decimate(self, decim: int, offset: int = 0, *, verbose=None
+                 ) -> 'EpochsView':
+        """Decimate the epochs, see :meth:`mne.Epochs.decimate`."""
+        if decim != 1:
+            return super().decimate(decim, offset, verbose=verbose)
+        # mne makes the data contiguous even when not decimating, which would
+        # copy the view
+        data, self._data = self._data, self._data[:0]
+        super().decimate(decim, offset, verbose=verbose)
+        self._data = data
+        return self
+
+    @verbose
+    def crop(self, tmin: float = None, tmax: float = None,
+             include_tmax: bool = True, verbose=None) -> 'EpochsView':
+        """Crop the epochs, see :meth:`mne.Epochs.crop`."""
+        # mne crops with a boolean mask, which would copy the view
+        times, data, self._data = self.times, self._data, self._data[:0]
+        super().crop(tmin, tmax, include_tmax, verbose=verbose)
+        start = np.searchsorted(times, self.times[0])
+        self._data = data[..., start:start + self.times.size]
+        return self
+
+
+def _as_slice(idx: np.ndarray) -> slice | None:
+    """The slice of an evenly spaced, increasing index, if it is one."""
+    if idx.size < 2:
+        start = int(idx[0]) if idx.size else 0
+        return slice(start, start + idx.size, 1)
+    step = np.unique(np.diff(idx))
+    if step.size == 1 and step[0] > 0:
+        return slice(int(idx[0]), int(idx[-1]) + 1, int(step[0]))
+    return None
+
+
 @fill_doc
 @verbose
 def trial_ieeg(raw: mne.io.Raw, event: str | list[str, ...], times: Doubles,
-               verbose=None, **kwargs) -> mne.Epochs:
+               view: bool = False, verbose=None, **kwargs
+               ) -> mne.Epochs | EpochsView:
     """Epochs data from a mne Raw iEEG instance.
 
     Takes a mne Raw instance and epochs the data around a specified event. If
@@ -241,6 +441,11 @@ def trial_ieeg(raw: mne.io.Raw, event: str | list[str, ...], times: Doubles,
         The event to epoch around.
     times : tuple[float, float]
         The time window to epoch around the event.
+    view : bool, optional
+        Whether to return an :class:`EpochsView` of the preloaded Raw that
+        shares its memory instead of copying every trial when possible. Only
+        picks and reject_by_annotation are supported in this mode. By
+        default False
     %(picks_all)s
     %(reject_epochs)s
     %(flat)s
@@ -253,7 +458,7 @@ def trial_ieeg(raw: mne.io.Raw, event: str | list[str, ...], times: Doubles,
 
     Returns
     -------
-    mne.Epochs
+    mne.Epochs | EpochsView
         The epoched data.
 
     Examples
@@ -282,15 +487,126 @@ def trial_ieeg(raw: mne.io.Raw, event: str | list[str, ...], times: Doubles,
     """
 
     # determine the events
-    events, ids = mne.events_from_annotations(raw)
-    dat_ids = [ids[i] for i in mne.event.match_event_names(ids, event)]
-    rev = {k: v for k, v in ids.items() if v in dat_ids}
+    events, ids = _event_index(raw)
+    rev = _match_ids(ids, event)
 
     # epoch the data
+    if view:
+        kwargs.pop('preload', None)
+        if unknown := set(kwargs) - {'picks', 'reject_by_annotation'}:
+            raise TypeError(f"{sorted(unknown)} not supported with view=True")
+        return EpochsView(raw, events, rev, *times, **kwargs)
     return mne.Epochs(raw, events, event_id=rev, tmin=times[0],
                       tmax=times[1], baseline=None, verbose=verbose, **kwargs)
 
 
+@fill_doc
+@verbose
+def trial_ieeg_batch(raw: mne.io.Raw,
+                     windows: dict[str | tuple[str, ...], Doubles] |
+                     list[tuple[str | tuple[str, ...], Doubles]],
+                     verbose=None, **kwargs) -> list[mne.Epochs]:
+    """Epochs data from a mne Raw iEEG instance around several events.
+
+    Equivalent to calling :func:`trial_ieeg` for each event and time window,
+    but the annotations are parsed into events once, and with
+    ``preload=True`` an unloaded Raw is read in a single pass over the span
+    covered by all the windows instead of once per epoch set, as long as the
+    windows add up to at least that span. Sparser windows are read one epoch
+    at a time, so the samples between them are never loaded.
+
+    Parameters
+    ----------
+    raw : mne.io.Raw
+        The raw data to epoch.
+    windows : dict | list of tuple
+        The events (a name or tuple of names) to epoch around, mapped to the
+        time window to epoch around each. A list of (event, times) pairs may be
+        given instead to repeat an event with different windows.
+    %(picks_all)s
+    %(reject_epochs)s
+    %(flat)s
+    %(decim)s
+    %(epochs_reject_tmin_tmax)s
+    %(detrend_epochs)s
+    %(proj_epochs)s
+    %(on_missing_epochs)s
+    %(verbose)s
+
+    Returns
+    -------
+    list[mne.Epochs]
+        The epoched data, in the order of the windows.
+
+    Examples
+    --------
+    >>> import mne
+    >>> from ieeg.io import raw_from_layout
+    >>> bids_root = mne.datasets.epilepsy_ecog.data_path(verbose=False)
+    >>> layout = BIDSLayout(bids_root)
+    >>> raw = raw_from_layout(layout, subject="pt1", preload=True,
+    ... extension=".vhdr", verbose=False)
+    Reading 0 ... 269079  =      0.000 ...   269.079 secs...
+    >>> ad, ast = trial_ieeg_batch(raw, {"AD1-4, ATT1,2": (-1, 2),
+    ... ('AST1,3', 'G16'): (-0.5, 1)}, verbose=False)
+    >>> len(ad), len(ast)
+    (1, 2)
+    """
+    if isinstance(windows, dict):
+        windows = list(windows.items())
+    events, ids = _event_index(raw)
+    revs = [_match_ids(ids, list(event) if isinstance(event, tuple)
+                       else event) for event, _ in windows]
+
+    if kwargs.get('preload', False) and not raw.preload and windows:
+        sfreq = raw.info['sfreq']
+        bounds = []
+        for rev, (_, t) in zip(revs, windows):
+            samps = events[np.isin(events[:, 2], list(rev.values())), 0] - \
+                raw.first_samp
+            bounds.append(np.stack([samps + int(np.floor(t[0] * sfreq)),
+                                    samps + int(np.ceil(t[1] * sfreq))], -1))
+        bounds = np.clip(np.concatenate(bounds), 0, raw.n_times - 1)
+        start, stop = bounds[:, 0].min(initial=0), bounds[:, 1].max(initial=0)
+        # the span is read once when the windows overlap enough to cover it,
+        # otherwise each epoch is read on its own
+        if bounds.size and stop - start <= np.sum(np.diff(bounds, axis=1)):
+            raw = raw.copy().crop(raw.times[start], raw.times[stop])
+            raw.load_data(verbose=verbose)
+
+    return [mne.Epochs(raw, events, event_id=rev, tmin=times[0],
+                       tmax=times[1], baseline=None, verbose=verbose, **kwargs)
+            for rev, (_, times) in zip(revs, windows)]
+
+
+def _event_index(raw: mne.io.BaseRaw) -> tuple[np.ndarray, dict[str, int]]:
+    """Events and event ids from the annotations, cached on the Raw.
+
+    The cache is kept as the ``_ieeg_events`` attribute of the Raw and is
+    refreshed whenever the annotations or first sample change.
+    """
+    annot = raw.annotations
+    key = (raw.first_samp, raw.info['sfreq'], annot.orig_time,
+           annot.onset.tobytes(), annot.duration.tobytes(),
+           tuple(annot.description))
+    cached = getattr(raw, '_ieeg_events', None)
+    if cached is not None and cached[0] == key:
+        events, ids = cached[1:]
+        mne.utils.logger.info(
+            f"Used Annotations descriptions: {list(ids.keys())}")
+    else:
+        events, ids = mne.events_from_annotations(raw)
+        raw._ieeg_events = (key, events, ids)
+    return events.copy(), ids.copy()
+
+
+def _match_ids(ids: dict[str, int], event: str | list[str, ...]
+               ) -> dict[str, int]:
+    """The event ids matching an event name or list of names."""
+    dat_ids = [ids[i] for i in mne.event.match_event_names(ids, event)]
+    return {k: v for k, v in ids.items() if v in dat_ids}
+
+
 if __name__ == "__main__":
     from os import path
     from ieeg.io import raw_from_layout
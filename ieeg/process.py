@@ -1,15 +1,23 @@
+import functools
 import inspect
 import operator
+import os
+import threading
 from itertools import chain
 from os import environ
+from tempfile import gettempdir
 from typing import Generator, Iterable, TypeVar, Union
 
 import numpy as np
 import pandas as pd
-from joblib import Parallel, cpu_count, delayed
+import joblib
+from joblib import Parallel, cpu_count, delayed, dump, load
+from joblib.disk import memstr_to_bytes
 from mne.utils import config, logger
 from scipy.signal import get_window
 
+from ieeg import Signal
+
 
 def iterate_axes(arr: np.ndarray, axes: tuple[int, ...], index=(), axis=0):
     """Iterate over all possible indices for a set of axes
@@ -537,10 +545,6 @@ class COLA:
                                  'buffer size (%s > %s)'
                                  % (data.shape, self._in_offset,
                                     self.stops[-1]))
-        # preallocate data to chunks
-        data_chunks = map(lambda x, y: data[x:y], self.starts, self.stops)
-        out_chunks = map(lambda d: self._process(d, **kwargs), data_chunks)
-
         # overlap add to buffer
         while self._idx < len(self.starts) and \
                 self._in_offset >= self.stops[self._idx]:
@@ -563,7 +567,7 @@ class COLA:
             if not all(proc.shape[-1] == this_len == this_window.size
                        for proc in this_proc):
                 raise RuntimeError('internal indexing error')
-            outs = next(out_chunks)
+            outs = self._process(*this_proc, **kwargs)
             if self._out_buffers is None:
                 max_len = np.max(self.stops - self.starts)
                 self._out_buffers = [np.zeros(o.shape[:-1] + (max_len,),
@@ -629,3 +633,220 @@ class _Storer(object):
         for o1, o2 in zip(self.outs, outs):
             o1[idx] = o2
         self.idx = stop
+
+
+###############################################################################
+# Content-addressed result caching
+
+
+_CACHE_STACK = []
+_CACHE_STATE = threading.local()
+
+
+class ResultCache(object):
+    """Content-addressed on-disk cache of function results.
+
+    Results are keyed on a hash of the input data together with the
+    parameters the function was called with, so that re-running a pipeline on
+    unchanged inputs loads the stored results instead of recomputing them.
+    Arrays in cache hits are memory-mapped rather than read into memory. When
+    the cache grows past ``bytes_limit``, the least recently used results are
+    evicted.
+
+    The cache can be used directly as a decorator, or as a context manager, in
+    which case every function decorated with :func:`cache_result` (such as
+    :func:`ieeg.mt_filter.line_filter`, :func:`ieeg.timefreq.gamma.extract`
+    and :func:`ieeg.timefreq.multitaper.spectrogram`) is cached while the
+    context is active.
+
+    Parameters
+    ----------
+    location : PathLike, optional
+        The directory to store results in. Defaults to an ``ieeg_cache``
+        folder in the MNE_CACHE_DIR, or in the system temp directory if that
+        is not set.
+    bytes_limit : int | str
+        The maximum size of the cache, either in bytes or as a string such as
+        '10G'.
+    mmap_mode : str
+        The mode to memory-map arrays with on cache hits. The default, 'c',
+        is copy-on-write, so results may be modified in memory without
+        altering the cache.
+    ignore : tuple[str]
+        Names of parameters that do not affect the result, and are therefore
+        left out of the key.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> cache = ResultCache(tempfile.mkdtemp(), bytes_limit='1M')
+    >>> @cache
+    ... def square(x):
+    ...     print('computing')
+    ...     return x ** 2
+    >>> square(np.arange(4))
+    computing
+    array([0, 1, 4, 9])
+    >>> square(np.arange(4))
+    memmap([0, 1, 4, 9])
+    >>> square(np.arange(5))
+    computing
+    array([ 0,  1,  4,  9, 16])
+    """
+
+    def __init__(self, location: str = None, bytes_limit: int | str = '10G',
+                 mmap_mode: str = 'c',
+                 ignore: tuple[str, ...] = ('verbose', 'n_jobs', 'copy')):
+        if location is None:
+            base = config.get_config('MNE_CACHE_DIR') or gettempdir()
+            location = os.path.join(base, 'ieeg_cache')
+        self.location = str(location)
+        if isinstance(bytes_limit, str):
+            bytes_limit = memstr_to_bytes(bytes_limit)
+        self.bytes_limit = int(bytes_limit)
+        self.mmap_mode = mmap_mode
+        self.ignore = tuple(ignore)
+
+    def __call__(self, func: callable) -> callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, args, kwargs)
+        return wrapper
+
+    def __enter__(self):
+        _CACHE_STACK.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _CACHE_STACK.remove(self)
+
+    def key(self, func: callable, args: tuple, kwargs: dict) -> str:
+        """Hash the input data and parameters of a function call.
+
+        Signals are hashed by their contents, including their data if it is
+        loaded, or the size and modification time of the files they read
+        from if it is not.
+        """
+        params = {k: _hash_token(v)
+                  for k, v in _bind_arguments(func, args, kwargs).items()
+                  if k not in self.ignore}
+        return joblib.hash((func.__module__, func.__qualname__, params))
+
+    def call(self, func: callable, args: tuple, kwargs: dict):
+        """Call a function, loading its result from the cache if present."""
+        if getattr(_CACHE_STATE, 'active', False):
+            # nested cached calls are covered by the outermost key
+            return func(*args, **kwargs)
+
+        key = self.key(func, args, kwargs)
+        fname = os.path.join(self.location, key + '.pkl')
+        _CACHE_STATE.active = True
+        try:
+            if os.path.isfile(fname):
+                logger.debug(f'Loading cached {func.__qualname__} result')
+                out = load(fname, mmap_mode=self.mmap_mode)
+                if isinstance(getattr(out, '_data', None), np.memmap):
+                    # Raw deletes the file behind a memmapped _data when it
+                    # is garbage collected, so hand it a plain array view
+                    out._data = np.asarray(out._data)
+                os.utime(fname)
+                return _update_inplace(out, args, _bind_arguments(
+                    func, args, kwargs))
+            out = func(*args, **kwargs)
+        finally:
+            _CACHE_STATE.active = False
+
+        os.makedirs(self.location, exist_ok=True)
+        tmp = f'{fname}.{os.getpid()}.{threading.get_ident()}.tmp'
+        dump(out, tmp)
+        os.replace(tmp, fname)
+        self.reduce_size()
+        return out
+
+    def reduce_size(self):
+        """Evict the least recently used results above the size limit."""
+        entries = []
+        with os.scandir(self.location) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(e[1] for e in entries)
+        for _, size, fpath in sorted(entries):
+            if total <= self.bytes_limit:
+                break
+            try:
+                os.remove(fpath)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all results from the cache."""
+        if os.path.isdir(self.location):
+            for entry in os.listdir(self.location):
+                if entry.endswith(('.pkl', '.tmp')):
+                    os.remove(os.path.join(self.location, entry))
+
+
+def cache_result(func: callable) -> callable:
+    """Cache a function's results whenever a :class:`ResultCache` is active.
+
+    Outside a ``with ResultCache(...):`` block the function is called as
+    normal. The signature and any ``singledispatch`` registry of the function
+    are preserved.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> @cache_result
+    ... def cube(x):
+    ...     print('computing')
+    ...     return x ** 3
+    >>> cube(np.arange(3))
+    computing
+    array([0, 1, 8])
+    >>> with ResultCache(tempfile.mkdtemp()):
+    ...     _ = cube(np.arange(3))
+    ...     cube(np.arange(3))
+    computing
+    memmap([0, 1, 8])
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _CACHE_STACK:
+            return func(*args, **kwargs)
+        return _CACHE_STACK[-1].call(func, args, kwargs)
+    return wrapper
+
+
+def _hash_token(obj):
+    if isinstance(obj, Signal) and not getattr(obj, 'preload', True):
+        # data is not loaded, so stand in the state of the files it reads
+        stats = [(f, os.path.getsize(f), os.path.getmtime(f))
+                 for f in getattr(obj, 'filenames', ()) if f is not None]
+        return obj, stats
+    return obj
+
+
+def _bind_arguments(func: callable, args: tuple, kwargs: dict) -> dict:
+    """Map the arguments of a call, with defaults, to their parameter names.
+
+    For a ``singledispatch`` function, the implementation dispatched on the
+    first argument is used.
+    """
+    impl = func
+    if hasattr(func, 'dispatch') and args:
+        impl = func.dispatch(type(args[0]))
+    bound = inspect.signature(impl).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def _update_inplace(out, args: tuple, arguments: dict):
+    """Reproduce the side effect of a ``copy=False`` call on a cache hit."""
+    if arguments.get('copy', True) is False and args and isinstance(
+            args[0], Signal) and type(out) is type(args[0]):
+        args[0].__dict__.update(out.__dict__)
+        return args[0]
+    return out
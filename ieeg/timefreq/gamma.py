@@ -1,21 +1,27 @@
-from functools import singledispatch
+import os
+from functools import lru_cache, singledispatch
+from tempfile import mkstemp
 
 import numpy as np
 from mne import Epochs
 from mne.io import Raw, base
+from scipy import fft
 from tqdm import tqdm
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, effective_n_jobs
+from joblib.disk import memstr_to_bytes
 
-from ieeg.process import COLA, cpu_count, get_mem, parallelize
-from ieeg.timefreq.utils import BaseEpochs, Evoked, Signal
-from ieeg.timefreq.hilbert import (filterbank_hilbert_first_half_wrapper,
-                                   extract_channel_wrapper)
+from ieeg.process import COLA, cache_result
+from ieeg.timefreq.utils import BaseEpochs, Evoked, Signal, to_samples
+from ieeg.timefreq.hilbert import (extract_channel_wrapper,
+                                   extract_envelope_wrapper, filter_bank)
 
 
+@cache_result
 @singledispatch
 def extract(data: np.ndarray, fs: int = None,
             passband: tuple[int, int] = (70, 150), copy: bool = True,
-            n_jobs=-1, verbose: bool = True) -> np.ndarray:
+            n_jobs=-1, verbose: bool = True, dtype: np.dtype = np.float64,
+            segment: str | int = None) -> np.ndarray:
     """Extract gamma band envelope from data.
 
     Parameters
@@ -32,6 +38,15 @@ def extract(data: np.ndarray, fs: int = None,
         Whether to copy data or operate in place if False, by default True
     n_jobs : int, optional
         Number of jobs to run in parallel, by default all available cores
+    dtype : np.dtype, optional
+        The float type of the envelope, by default float64. With float32,
+        the envelope takes half the memory.
+    segment : str | int, optional
+        For (channels, time) data, the envelope is computed by overlap-add of
+        segments of this length (e.g. "10s", or an int in samples), instead
+        of from a single FFT of the whole signal. Memory use then depends
+        on the segment length rather than the recording duration. For a Raw
+        that is not preloaded, the default is "10s".
 
     Returns
     -------
@@ -43,9 +58,9 @@ def extract(data: np.ndarray, fs: int = None,
     This function is a wrapper for
     `filterbank_hilbert <https://naplib-python.readthedocs.io/en/latest/referen
     ces/preprocessing.html#naplib.preprocessing.filterbank_hilbert>`_. It is a
-    convenience function for extracting the gamma envelope from data. It is
-    optimized for speed, but not memory. If you have a lot of data, you may
-    want to epoch your data first and then extract the envelope.
+    convenience function for extracting the gamma envelope from data. Without
+    a ``segment``, continuous data is transformed in one FFT, which is fast
+    but takes memory in proportion to the recording duration.
 
     Examples
     --------
@@ -89,26 +104,20 @@ def extract(data: np.ndarray, fs: int = None,
         in_data = data
 
     passband = list(passband)
-    env = np.zeros(in_data.shape)
+    env = np.zeros(in_data.shape, dtype=dtype)
 
     if len(in_data.shape) == 3:  # Assume shape is (trials, channels, time)
-        trials = range(in_data.shape[0])
-        if n_jobs != 1:
-            ins = (in_data[trial].T for trial in trials)
-            par_out = parallelize(filterbank_hilbert, ins, fs=fs, Wn=passband,
-                                  n_jobs=n_jobs)
-            env[:, :, :] = np.array([np.sum(out, axis=-1).T for
-                                     out in par_out])
-        else:
-            if verbose:
-                trials = tqdm(trials)
-            for trial in trials:
-                out = filterbank_hilbert(in_data[trial, :, :].T, fs,
-                                         passband, 1)
-                env[trial, :, :] = np.sum(out, axis=-1).T
+        # all trials share the filter bank, so they are transformed together
+        n_times = in_data.shape[-1]
+        _envelope_batch(in_data.reshape(-1, n_times), fs, passband,
+                        env.reshape(-1, n_times), effective_n_jobs(n_jobs),
+                        verbose=verbose)
+    elif len(in_data.shape) == 2 and segment is not None:
+        _stream_envelope(lambda start, stop: in_data[:, start:stop], env, fs,
+                         passband, to_samples(segment, fs),
+                         effective_n_jobs(n_jobs))
     elif len(in_data.shape) == 2:  # Assume shape is (channels, time)
-        out = filterbank_hilbert(in_data.T, fs, passband, n_jobs)
-        env = np.sum(out, axis=-1).T
+        filterbank_envelope(in_data, fs, passband, n_jobs, out=env)
     else:
         raise ValueError("number of dims should be either 2 or 3, not {}"
                          "".format(len(in_data.shape)))
@@ -132,56 +141,135 @@ def _extract_inst(inst: Signal, fs: int, copy: bool, **kwargs) -> Signal:
 @extract.register
 def _(inst: base.BaseRaw, fs: int = None,
       passband: tuple[int, int] = (70, 150),
-      copy: bool = True, n_jobs=-1, verbose: bool = True) -> Raw:
-    """Extract gamma band envelope from Raw object."""
-    return _extract_inst(inst, fs, copy, passband=passband, n_jobs=n_jobs,
-                         verbose=verbose)
+      copy: bool = True, n_jobs=-1, verbose: bool = True,
+      dtype: np.dtype = np.float64, segment: str | int = None,
+      memmap: str | bool = True) -> Raw:
+    """Extract gamma band envelope from Raw object.
+
+    A Raw that is not preloaded is read one segment at a time, and the
+    envelope is written to a memory-mapped file at ``memmap``, which is kept
+    after the returned Raw is deleted, or to a temporary file if True, which
+    is deleted along with the returned Raw. If False, the envelope is kept in
+    memory.
+    """
+    if inst.preload:
+        return _extract_inst(inst, fs, copy, passband=passband,
+                             n_jobs=n_jobs, verbose=verbose, dtype=dtype,
+                             segment=segment)
+    if fs is None:
+        fs = inst.info['sfreq']
+    sig = inst.copy() if copy else inst
+    if segment is None:
+        segment = '10s'
+
+    shape = (sig.info['nchan'], sig.n_times)
+    temp = memmap is True
+    if temp:
+        fd, memmap = mkstemp(suffix='-gamma.dat')
+        os.close(fd)
+    if memmap:
+        out = np.memmap(memmap, dtype, 'w+', shape=shape)
+    else:
+        out = np.empty(shape, dtype)
+    _stream_envelope(lambda start, stop: sig.get_data(start=start, stop=stop),
+                     out, fs, passband, to_samples(segment, fs),
+                     effective_n_jobs(n_jobs))
+    if memmap:
+        out.flush()
+        if not temp:
+            # mne deletes the file of a memmap along with the Raw, so a file
+            # given by path is kept by only handing it a plain array view
+            out = out.view(np.ndarray)
+    sig._data = out
+    sig.preload = True
+    return sig
 
 
 @extract.register
 def _(inst: BaseEpochs, fs: int = None,
       passband: tuple[int, int] = (70, 150),
-      copy: bool = True, n_jobs=-1, verbose: bool = True) -> Epochs:
+      copy: bool = True, n_jobs=-1, verbose: bool = True,
+      dtype: np.dtype = np.float64) -> Epochs:
     """Extract gamma band envelope from Epochs object."""
     return _extract_inst(inst, fs, copy, passband=passband, n_jobs=n_jobs,
-                         verbose=verbose)
+                         verbose=verbose, dtype=dtype)
 
 
 @extract.register
 def _(inst: Evoked, fs: int = None,
       passband: tuple[int, int] = (70, 150),
-      copy: bool = True, n_jobs=-1, verbose: bool = True) -> Evoked:
+      copy: bool = True, n_jobs=-1, verbose: bool = True,
+      dtype: np.dtype = np.float64, segment: str | int = None) -> Evoked:
     """Extract gamma band envelope from Evoked object."""
     return _extract_inst(inst, fs, copy, passband=passband, n_jobs=n_jobs,
-                         verbose=verbose)
-
-
-def _my_hilt(x: np.ndarray, fs, Wn=(1, 150), n_jobs=-1):
-    # Set default window function and threshold
-    cfs = get_centers(Wn)
-    n_times = x.shape[0]
-    bytes_per = 16  # numpy complex128 is 16 bytes per num
-    chunk_size = min([x.size * bytes_per * len(cfs), get_mem()])
-    n_samples = int(chunk_size / (cpu_count() * x.shape[1] * len(cfs)))
-    n_overlap = (n_samples + 1) // 2
-    x_out = np.zeros_like(x.T)
+                         verbose=verbose, dtype=dtype, segment=segment)
+
+
+def _stream_envelope(read: callable, out: np.ndarray, fs: int, Wn,
+                     n_samples: int, workers: int = 1) -> np.ndarray:
+    """Band-summed envelope of a long signal, by overlap-add of segments.
+
+    The signal is read and transformed one segment at a time, and the
+    envelopes of segments that overlap by half are cross-faded with Hann
+    windows. Each segment's edge effects therefore fall where its weight is
+    near zero. The output is written in order, so it can be memory-mapped,
+    and memory use depends only on the segment length.
+
+    Parameters
+    ----------
+    read : callable
+        A function that takes a start and stop sample and returns the signal,
+        shaped (channels, time), in that range.
+    out : np.ndarray, shape (channels, time)
+        The array to write the envelope to.
+    fs : int
+        Sampling rate.
+    Wn : list or array-like, length 2
+        Lower and upper boundaries for filterbank center frequencies.
+    n_samples : int
+        The length of each segment, in samples.
+    workers : int
+        The number of threads for each FFT.
+
+    Returns
+    -------
+    out : np.ndarray, shape (channels, time)
+        The envelope.
+
+    Examples
+    --------
+    >>> rng = np.random.default_rng(42)
+    >>> x = rng.standard_normal((2, 20000))
+    >>> out = _stream_envelope(lambda start, stop: x[:, start:stop],
+    ...                        np.empty(x.shape), 1000, (70, 150), 2000)
+    >>> full = filterbank_envelope(x, 1000, (70, 150))
+    >>> bool(np.median(np.abs(out - full) / full) < 0.01)
+    True
+    """
+    n_times = out.shape[-1]
+    n_samples = min(n_samples, n_times)
     idx = [0]
 
     # Define how to process a chunk of data
     def process(x_):
-        out = filterbank_hilbert(x_, fs, Wn, 1)
-        return (out[1])  # must return a tuple
+        env = np.zeros(x_.shape, dtype=out.dtype)
+        return (_envelope_batch(x_, fs, Wn, env, workers),)
 
     # Define how to store a chunk of fully processed data (it's trivial)
     def store(x_):
-        stop = idx[0] + x_.T.shape[-1]
-        x_out[..., idx[0]:stop] += x_.T
+        stop = idx[0] + x_.shape[-1]
+        out[..., idx[0]:stop] = x_
         idx[0] = stop
 
-    COLA(process, store, n_times, n_samples, n_overlap, fs,
-         n_jobs=n_jobs).feed(x)
-    assert idx[0] == n_times
-    return x_out, cfs
+    cola = COLA(process, store, n_times, n_samples, (n_samples + 1) // 2, fs,
+                verbose=False)
+    for start in range(0, n_times, n_samples):
+        cola.feed(read(start, min(start + n_samples, n_times)))
+    if idx[0] != n_times:
+        raise ValueError(f"Only {idx[0]} of {n_times} samples of the "
+                         f"envelope were written, the signal read is too "
+                         f"short")
+    return out
 
 
 def get_centers(Wn):
@@ -235,6 +323,124 @@ def get_centers(Wn):
     return cfs
 
 
+@lru_cache(maxsize=8)
+def _filter_bank(n_times: int, fs: int, minf: float, maxf: float
+                 ) -> tuple[np.ndarray, np.ndarray]:
+    """Build the filter bank of ``filterbank_hilbert`` once per epoch length.
+
+    The (n_times, n_bands) complex frequency responses only depend on the
+    arguments, so they are shared across channels, trials and calls. The
+    returned arrays must not be modified.
+
+    Examples
+    --------
+    >>> cfs, H = _filter_bank(1000, 500, 70., 150.)
+    >>> H.shape, H.dtype
+    ((1000, 8), dtype('complex64'))
+    >>> _filter_bank(1000, 500, 70., 150.)[1] is H
+    True
+    """
+    if minf >= maxf:
+        raise ValueError(
+            (f'Upper bound of frequency range must be greater than lower bound'
+             f', but got lower bound of {minf} and upper bound of {maxf}'))
+    return filter_bank(n_times, fs, minf, maxf)
+
+
+def filterbank_envelope(x: np.ndarray, fs: int, Wn=(70, 150),
+                        n_jobs: int = 1, out: np.ndarray = None
+                        ) -> np.ndarray:
+    """Sum of the ``filterbank_hilbert`` envelopes over the frequency bands.
+
+    The envelope of each band is added to the output as it is computed, so
+    that the (time, channels, bands) envelopes are never held in memory.
+
+    Parameters
+    ----------
+    x : np.ndarray, shape (channels, time)
+        Signal to filter. Filtering is performed on each channel independently.
+    fs : int
+        Sampling rate.
+    Wn : list or array-like, length 2, default=(70, 150)
+        Lower and upper boundaries for filterbank center frequencies.
+    n_jobs : int, default=1
+        Number of threads to compute channels in parallel.
+    out : np.ndarray, shape (channels, time), optional
+        Array to add the envelope to, which should be zeros. If None, a new
+        float32 array is used.
+
+    Returns
+    -------
+    out : np.ndarray, shape (channels, time)
+        The envelope summed over the bands of the filterbank.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> x = np.random.rand(3, 1000) # 3 channels of signals
+    >>> env = filterbank_envelope(x, 500, Wn=[1, 150])
+    >>> env.shape, env.dtype
+    ((3, 1000), dtype('float32'))
+    >>> hilb = filterbank_hilbert(x.T, 500, Wn=[1, 150])
+    >>> np.allclose(env, np.sum(hilb, axis=-1).T, rtol=1e-4)
+    True
+    """
+    x = np.asarray(x, dtype='float32')
+    minf, maxf = Wn
+    if out is None:
+        out = np.zeros(x.shape, dtype='float32')
+
+    _, H = _filter_bank(x.shape[-1], fs, minf, maxf)
+    Xf = fft.fft(x, axis=-1).astype('complex64')
+
+    if n_jobs == 1:
+        for chn in range(x.shape[0]):
+            extract_envelope_wrapper(Xf[chn], H, out[chn])
+    else:
+        Parallel(n_jobs, require='sharedmem')(
+            delayed(extract_envelope_wrapper)(Xf[chn], H, out[chn])
+            for chn in range(x.shape[0]))
+    return out
+
+
+def _envelope_batch(x: np.ndarray, fs: int, Wn, out: np.ndarray,
+                    workers: int = 1, max_nbytes: int | str = '256M',
+                    verbose: bool = False) -> np.ndarray:
+    """Band-summed envelope of many (trial x channel) rows with batched FFTs.
+
+    All rows are transformed at once, and the shared filter bank is applied
+    to blocks of rows that fit in ``max_nbytes`` for the inverse transforms.
+    Parallelism comes from the FFT threads rather than from processes.
+
+    Examples
+    --------
+    >>> x = np.random.rand(6, 1000)
+    >>> env = _envelope_batch(x, 500, (70, 150), np.zeros(x.shape), 2,
+    ...                       max_nbytes=x.nbytes)
+    >>> np.allclose(env, filterbank_envelope(x, 500, (70, 150)), rtol=1e-4)
+    True
+    """
+    minf, maxf = Wn
+    n_times = x.shape[-1]
+    if isinstance(max_nbytes, str):
+        max_nbytes = memstr_to_bytes(max_nbytes)
+    _, H = _filter_bank(n_times, fs, minf, maxf)
+    H = np.ascontiguousarray(H.T)
+    Xf = fft.fft(np.asarray(x, dtype='float32'), axis=-1, workers=workers)
+
+    # the filtered block and its inverse transform are held at once
+    step = max(1, int(max_nbytes // (2 * Xf.itemsize * n_times)))
+    blocks = range(0, x.shape[0], step)
+    if verbose:
+        blocks = tqdm(blocks)
+    for start in blocks:
+        rows = slice(start, start + step)
+        for h in H:
+            out[rows] += np.abs(fft.ifft(Xf[rows] * h, axis=-1,
+                                         workers=workers))
+    return out
+
+
 def filterbank_hilbert(x, fs, Wn=[70, 150], n_jobs=1):
     """
     Compute the phase and amplitude (envelope) of a signal for a single
@@ -290,11 +496,11 @@ def filterbank_hilbert(x, fs, Wn=[70, 150], n_jobs=1):
             (f'Upper bound of frequency range must be greater than lower bound'
              f', but got lower bound of {minf} and upper bound of {maxf}'))
 
-    Xf, freqs, cfs, N, sds, h = filterbank_hilbert_first_half_wrapper(
-        x, fs, minf, maxf)
+    cfs, H = _filter_bank(x.shape[0], fs, minf, maxf)
+    Xf = fft.fft(x, axis=0).astype('complex64')
 
     def extract_channel(Xf):
-        return extract_channel_wrapper(Xf, freqs, cfs, N, sds, h, minf, maxf)
+        return extract_channel_wrapper(Xf, H)
 
     # pre-allocate
     hilb_amp = np.zeros((*x.shape, len(cfs)), dtype='float32')
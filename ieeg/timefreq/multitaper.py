@@ -1,8 +1,11 @@
+import os
 from collections import Counter
-from functools import cache, singledispatch
+from functools import lru_cache, singledispatch
 from typing import Union
 
+import joblib
 import numpy as np
+from joblib.disk import memstr_to_bytes
 from mne import Epochs, event, events_from_annotations
 from mne.epochs import BaseEpochs
 from mne.io import Raw, base
@@ -12,8 +15,8 @@ from scipy import fft, signal, stats
 
 from ieeg import ListNum
 from ieeg.calc.scaling import rescale
-from ieeg.calc.stats import sine_f_test
-from ieeg.process import COLA, is_number
+from ieeg.calc.stats import sine_f_test, sum_squared
+from ieeg.process import COLA, ResultCache, cache_result, is_number
 from ieeg.timefreq.utils import crop_pad, to_samples
 
 
@@ -38,6 +41,12 @@ class WindowingRemover(object):
         The bandwidth of the multitaper windowing function.
     p_value : float
         The p-value to use in the F-test.
+    n_detect : int | None
+        If given, the line components are detected once, on this many evenly
+        spaced windows, and then removed from every window without
+        recomputing the F-test, see ``detect``.
+    workers : int
+        The number of threads for each FFT, see ``spectra``.
     verbose : bool
         Whether to print information.
     """
@@ -46,6 +55,7 @@ class WindowingRemover(object):
     def __init__(self, sfreq: float, line_freqs: ListNum,
                  notch_width: ListNum, filter_length: int, low_bias: bool,
                  adaptive: bool, bandwidth: float, p_value: float,
+                 n_detect: int = None, workers: int = 1,
                  verbose: bool = None):
         self.sfreq = sfreq
         self.line_freqs = line_freqs
@@ -58,6 +68,12 @@ class WindowingRemover(object):
         self.bandwidth = bandwidth
         self.logger = logger
         self.rm_freqs = list()
+        self._thresh = dict()
+        self.n_detect = n_detect
+        self.workers = workers
+        self.fixed = None
+        self.deviation = None
+        self._fixed = dict()
 
     def dpss_windows(self, N: int, half_nbw: float, Kmax: int, *,
                      sym: bool = True, norm: Union[int, str] = None
@@ -108,18 +124,7 @@ class WindowingRemover(object):
         57(5):1371–1430, 1978. doi:10.1002/j.1538-7305.1978.tb02104.x.
         """
 
-        dpss, eigvals = signal.windows.dpss(
-            N, half_nbw, Kmax, sym=sym, norm=norm, return_ratios=True)
-        if self.low_bias:
-            idx = (eigvals > 0.9)
-            if not idx.any():
-                self.logger.warn('Could not properly use low_bias, keeping'
-                                 'lowest-bias taper')
-                idx = [np.argmax(eigvals)]
-            dpss, eigvals = dpss[idx], eigvals[idx]
-        assert len(dpss) > 0  # should never happen
-        assert dpss.shape[1] == N  # old nitime bug
-        return dpss, eigvals
+        return _dpss(N, half_nbw, Kmax, self.low_bias, sym, norm)
 
     @fill_doc
     def params(self, n_times: int) -> tuple[np.ndarray, np.ndarray, bool]:
@@ -173,7 +178,6 @@ class WindowingRemover(object):
 
         return window_fun, eigvals, self.adaptive
 
-    @cache
     def get_thresh(self, n_times: int = None) -> tuple[np.ndarray, float]:
         """Get the window function and threshold for given time points.
 
@@ -192,43 +196,149 @@ class WindowingRemover(object):
 
         if n_times is None:
             n_times = self.filter_length
+        if n_times not in self._thresh:
+            # figure out what tapers to use
+            window_fun, _, _ = self.params(n_times)
 
-        # figure out what tapers to use
-        window_fun, _, _ = self.params(n_times)
-
-        # F-stat of 1-p point
-        threshold = stats.f.ppf(1 - self.p_value / n_times, 2,
-                                2 * len(window_fun) - 2)
-        return window_fun, threshold
+            # F-stat of 1-p point
+            threshold = _f_threshold(self.p_value, n_times, len(window_fun))
+            self._thresh[n_times] = window_fun, threshold
+        return self._thresh[n_times]
 
     def __call__(self, x: np.ndarray) -> np.ndarray:
-        """Remove line frequencies from data using multitaper method."""
-        # Set default window function and threshold
-        window_fun, thresh = self.get_thresh()
+        """Remove line frequencies from data using multitaper method.
+
+        ``x`` may be a single channel or a (channels X time) block, in which
+        case every window is transformed and tested for all channels at once
+        and ``rm_freqs`` gets one entry per window and channel.
+        """
         n_times = x.shape[-1]
-        n_samples = window_fun.shape[1]
-        n_overlap = (n_samples + 1) // 2
         x_out = np.zeros_like(x)
         idx = [0]
 
-        # Define how to process a chunk of data
-        def process(x_):
-            window_fun, thresh = self.get_thresh()
-            out = _mt_remove(x_, self.sfreq, self.line_freqs, self.notch_width,
-                             window_fun, thresh, self.get_thresh)
-            self.rm_freqs.append(out[1])
-            return (out[0],)  # must return a tuple
-
         # Define how to store a chunk of fully processed data (it's trivial)
         def store(x_):
             stop = idx[0] + x_.shape[-1]
             x_out[..., idx[0]:stop] += x_
             idx[0] = stop
 
-        COLA(process, store, n_times, n_samples, n_overlap, self.sfreq,
-             verbose=False).feed(x)
+        if self.n_detect:
+            self.detect(lambda start, stop: x[..., start:stop], n_times)
+        self.cola(n_times, store).feed(x)
         assert idx[0] == n_times
+        self.report()
+        return x_out
+
+    def cola(self, n_times: int, store: callable) -> COLA:
+        """Set up line removal of a signal that is fed in chunks.
+
+        Parameters
+        ----------
+        n_times : int
+            The total number of time points of the signal.
+        store : callable
+            A function that takes each chunk of the filtered signal, in order.
+
+        Returns
+        -------
+        COLA
+            The overlap-add processor, to call ``feed`` on with consecutive
+            chunks of the signal.
+        """
+        # Set default window function and threshold
+        window_fun, thresh = self.get_thresh()
+        n_samples = window_fun.shape[1]
+        n_overlap = (n_samples + 1) // 2
+
+        # Define how to process a chunk of data
+        def process(x_):
+            window_fun, thresh = self.get_thresh(x_.shape[-1])
+            if self.fixed is None:
+                out = _mt_remove(x_, self.sfreq, self.line_freqs,
+                                 self.notch_width, window_fun, thresh,
+                                 self.get_thresh, self.workers)
+            else:
+                out = _mt_apply(x_, self.sfreq, window_fun,
+                                self._fixed_bins(x_.shape[-1]), self.workers)
+            if x_.ndim == 1:
+                self.rm_freqs.append(out[1])
+            else:
+                self.rm_freqs.extend(out[1])
+            return (out[0],)  # must return a tuple
+
+        return COLA(process, store, n_times, n_samples, n_overlap, self.sfreq,
+                    verbose=False)
+
+    def detect(self, read: callable, n_times: int) -> np.ndarray:
+        """Find the line components to remove from a subsample of windows.
+
+        The F-test is run on ``n_detect`` evenly spaced windows, and the
+        frequencies that are significant in at least half of them are kept
+        for each channel. Windows processed afterwards only fit and subtract
+        these components (see ``_mt_apply``). The relative RMS difference
+        between the fixed fit and the full F-test fit on the sampled windows
+        is logged and stored in ``deviation``.
+
+        Parameters
+        ----------
+        read : callable
+            A function that takes a start and stop sample and returns the
+            signal, shaped (n_times,) or (n_channels, n_times), in that range.
+        n_times : int
+            The total number of time points of the signal.
 
+        Returns
+        -------
+        fixed : array of bool, shape=(n_channels, n_freqs)
+            The frequencies to remove from each channel.
+        """
+        window_fun, thresh = self.get_thresh()
+        n_samples = window_fun.shape[1]
+        starts = np.arange(0, n_times - n_samples + 1,
+                           n_samples - (n_samples + 1) // 2)
+        use = np.linspace(0, len(starts) - 1, min(self.n_detect, len(starts)))
+        starts = starts[np.unique(np.round(use).astype(int))]
+
+        fits = []
+        for start in starts:
+            x_ = np.atleast_2d(read(start, start + n_samples))
+            A, remove, freqs = _line_components(
+                x_, self.sfreq, self.line_freqs, self.notch_width, window_fun,
+                thresh, self.workers)
+            fits.append((A, remove))
+        counts = sum(remove.astype(int) for _, remove in fits)
+        fixed = 2 * counts >= len(fits)
+
+        # compare the fixed fit to the full method on the sampled windows
+        err = power = 0.
+        for A, remove in fits:
+            full = _fit_sinusoids(A, remove, n_samples)
+            err += np.sum((full - _fit_sinusoids(A, fixed, n_samples)) ** 2)
+            power += np.sum(full ** 2)
+        self.deviation = np.sqrt(err / power) if power else 0.
+
+        found = np.unique(np.round(freqs[fixed.any(axis=0)])).tolist()
+        found_freqs = ', '.join(f'{freq:.2f}' for freq in found) or 'None'
+        self.logger.info(f'Fixed notch frequencies from {len(fits)} '
+                         f'window{_pl(fits)} (Hz): {found_freqs}, deviation '
+                         f'from the full F-test: {self.deviation:.2%}')
+        self.fixed = fixed
+        self._fixed = {n_samples: fixed}
+        return fixed
+
+    def _fixed_bins(self, n_times: int) -> np.ndarray:
+        """The detected frequencies on the rFFT bins of a window length."""
+        if n_times not in self._fixed:
+            freqs = fft.rfftfreq(self.filter_length, 1. / self.sfreq)
+            bins = np.round(freqs * n_times / self.sfreq).astype(int)
+            mask = np.zeros((self.fixed.shape[0], n_times // 2 + 1), bool)
+            rows, cols = np.nonzero(self.fixed)
+            mask[rows, bins[cols]] = True
+            self._fixed[n_times] = mask
+        return self._fixed[n_times]
+
+    def report(self):
+        """Log the frequencies removed so far."""
         # report found frequencies, but do some sanitizing first by binning
         # into 1 Hz bins
         counts = Counter(sum((np.unique(np.round(ff)).tolist()
@@ -239,28 +349,135 @@ class WindowingRemover(object):
                                 for freq in sorted(counts)) or '    None'
         self.logger.info(f'{kind} notch frequencies (Hz):\n{found_freqs}')
 
-        x = x_out
-        return x_out
+
+_DPSS_DIR = None  # on-disk tier of the taper cache, see set_dpss_cache
+
+
+def set_dpss_cache(location: str | bool = True) -> str | None:
+    """Store DPSS tapers on disk so that other processes can reuse them.
+
+    Tapers are always kept in an in-memory LRU cache for the lifetime of the
+    process. With a disk tier, batch runs over many subjects with the same
+    filter length and bandwidth, and parallel workers, solve the Slepian
+    eigenproblem once.
+
+    Parameters
+    ----------
+    location : str | bool, optional
+        The directory to store tapers in. If True, a ``dpss`` folder in the
+        ``ieeg_cache`` directory of the MNE_CACHE_DIR (or the system temp
+        directory) is used. If False or None, the disk tier is disabled.
+
+    Returns
+    -------
+    str | None
+        The directory tapers are stored in.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> location = set_dpss_cache(tempfile.mkdtemp())
+    >>> tapers, eigvals = _dpss(1000, 4., 7, True)
+    >>> _dpss.cache_clear()
+    >>> np.array_equal(_dpss(1000, 4., 7, True)[0], tapers)
+    True
+    >>> set_dpss_cache(False)
+    """
+    global _DPSS_DIR
+    if location is True:
+        location = os.path.join(ResultCache().location, 'dpss')
+    _DPSS_DIR = str(location) if location else None
+    _dpss.cache_clear()
+    return _DPSS_DIR
+
+
+@lru_cache(maxsize=32)
+def _dpss(n_times: int, half_nbw: float, kmax: int, low_bias: bool,
+          sym: bool = True, norm: Union[int, str] = None
+          ) -> tuple[np.ndarray, np.ndarray]:
+    """DPSS tapers and their eigenvalues, cached in memory and on disk.
+
+    The returned arrays are shared between callers and are read-only.
+    """
+    fname = None
+    if _DPSS_DIR is not None:
+        key = joblib.hash((n_times, float(half_nbw), kmax, low_bias, sym,
+                           norm))
+        fname = os.path.join(_DPSS_DIR, f'dpss_{key}.npz')
+        if os.path.isfile(fname):
+            with np.load(fname) as f:
+                dpss, eigvals = f['dpss'], f['eigvals']
+            dpss.flags.writeable = eigvals.flags.writeable = False
+            return dpss, eigvals
+
+    dpss, eigvals = signal.windows.dpss(
+        n_times, half_nbw, kmax, sym=sym, norm=norm, return_ratios=True)
+    if low_bias:
+        idx = (eigvals > 0.9)
+        if not idx.any():
+            logger.warn('Could not properly use low_bias, keeping'
+                        'lowest-bias taper')
+            idx = [np.argmax(eigvals)]
+        dpss, eigvals = dpss[idx], eigvals[idx]
+    assert len(dpss) > 0  # should never happen
+    assert dpss.shape[1] == n_times  # old nitime bug
+
+    if fname is not None:
+        os.makedirs(_DPSS_DIR, exist_ok=True)
+        tmp = f'{fname}.{os.getpid()}.tmp.npz'
+        np.savez(tmp, dpss=dpss, eigvals=eigvals)
+        os.replace(tmp, fname)
+    dpss.flags.writeable = eigvals.flags.writeable = False
+    return dpss, eigvals
+
+
+@lru_cache(maxsize=128)
+def _f_threshold(p_value: float, n_times: int, n_tapers: int) -> float:
+    """F-statistic of the Bonferroni corrected 1 - p point."""
+    return stats.f.ppf(1 - p_value / n_times, 2, 2 * n_tapers - 2)
 
 
 def _mt_remove(x: np.ndarray, sfreq: float, line_freqs: ListNum,
                notch_widths: ListNum, window_fun: np.ndarray,
-               threshold: float, get_thresh: callable,
-               ) -> tuple[np.ndarray, list[float]]:
+               threshold: float, get_thresh: callable, workers: int = 1,
+               ) -> tuple[np.ndarray, np.ndarray | list[np.ndarray]]:
     """Use MT-spectrum to remove line frequencies.
     Based on Chronux. If line_freqs is specified, all freqs within notch_width
-    of each line_freq is set to zero.
+    of each line_freq is set to zero. x may be a single channel or a
+    (channels X time) block, which is transformed and tested in one batch. The
+    removed frequencies are returned for each channel of a block.
     """
 
-    assert x.ndim == 1
+    assert x.ndim in (1, 2)
     if x.shape[-1] != window_fun.shape[-1]:
         window_fun, threshold = get_thresh(x.shape[-1])
+    A, remove, freqs = _line_components(np.atleast_2d(x), sfreq, line_freqs,
+                                        notch_widths, window_fun, threshold,
+                                        workers)
+
+    # fitted sinusoids are summed, and subtracted from data
+    datafit = _fit_sinusoids(A, remove, x.shape[-1])
+
+    if x.ndim == 1:
+        return x - datafit[0], freqs[remove[0]]
+    return x - datafit, [freqs[r] for r in remove]
+
+
+def _line_components(x: np.ndarray, sfreq: float, line_freqs: ListNum,
+                     notch_widths: ListNum, window_fun: np.ndarray,
+                     threshold: float, workers: int = 1
+                     ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Find the significant sinusoids of a (channels X time) block.
+
+    Returns the complex amplitudes from the F-test, the frequencies to remove
+    from each channel, both shaped (n_channels, n_freqs), and the frequencies.
+    """
     # compute mt_spectrum (returning n_ch, n_tapers, n_freq)
-    x_p, freqs = spectra(x[np.newaxis, :], window_fun, sfreq)
+    x_p, freqs = spectra(x, window_fun, sfreq, workers=workers)
     f_stat, A = sine_f_test(window_fun, x_p)
 
-    # find frequencies to remove
-    indices = np.where(f_stat > threshold)[1]
+    # find frequencies to remove (n_ch, n_freq)
+    remove = f_stat > threshold
     # pdf = 1-stats.f.cdf(f_stat, 2, window_fun.shape[0]-2)
     # indices = np.where(pdf < 1/x.shape[-1])[1]
     # specify frequencies within indicated ranges
@@ -268,30 +485,109 @@ def _mt_remove(x: np.ndarray, sfreq: float, line_freqs: ListNum,
         if not isinstance(notch_widths, (list, tuple)) and is_number(
                 notch_widths):
             notch_widths = [notch_widths] * len(line_freqs)
-        ranges = [(freq - notch_width / 2, freq + notch_width / 2
-                   ) for freq, notch_width in zip(line_freqs, notch_widths)]
-        indices = [ind for ind in indices if any(
-            lower <= freqs[ind] <= upper for (lower, upper) in ranges)]
+        in_range = np.zeros(freqs.shape, dtype=bool)
+        for freq, notch_width in zip(line_freqs, notch_widths):
+            in_range |= (freq - notch_width / 2 <= freqs) & (
+                freqs <= freq + notch_width / 2)
+        remove &= in_range
+    return A, remove, freqs
+
+
+def _mt_apply(x: np.ndarray, sfreq: float, window_fun: np.ndarray,
+              remove: np.ndarray, workers: int = 1
+              ) -> tuple[np.ndarray, np.ndarray | list[np.ndarray]]:
+    """Remove fixed line frequencies by multitaper regression.
+
+    The amplitudes of ``sine_f_test`` are linear in the tapered spectra, so
+    they are the spectrum of the signal under a single combined taper, and the
+    F statistic is not computed. Only channels with frequencies to remove are
+    transformed. The inputs and outputs are as for ``_mt_remove``.
+
+    Examples
+    --------
+    >>> t = np.arange(1000) / 1000
+    >>> x = np.sin(2 * np.pi * 60 * t) + np.random.randn(1000) * .1
+    >>> window_fun = signal.windows.dpss(1000, 4., 7)
+    >>> remove = np.zeros((1, 501), bool)
+    >>> remove[0, 60] = True
+    >>> x_p, _ = spectra(x[np.newaxis], window_fun, 1000)
+    >>> A = sine_f_test(window_fun, x_p)[1]
+    >>> expected = x - _fit_sinusoids(A, remove, 1000)[0]
+    >>> out, freqs = _mt_apply(x, 1000, window_fun, remove)
+    >>> np.allclose(out, expected), freqs
+    (True, array([60.]))
+    """
+    x2 = np.atleast_2d(x)
+    n_times = x2.shape[-1]
+    chans = remove.any(axis=-1)
+    A = np.zeros(remove.shape, dtype=np.complex128)
+    if chans.any():
+        # combined taper, sum(H0_j * w_j) / sum(H0_j ** 2) over odd tapers
+        tapers = window_fun[::2]
+        H0 = np.sum(tapers, axis=1)
+        taper = H0 @ tapers / sum_squared(H0)
+        x_ = x2[chans] - np.mean(x2[chans], axis=-1, keepdims=True)
+        A[chans] = fft.rfft(x_ * taper, axis=-1, workers=workers)
+        A[:, 0] /= np.sqrt(2.)
+        if n_times % 2 == 0:
+            A[:, -1] /= np.sqrt(2.)
+    datafit = _fit_sinusoids(A, remove, n_times)
+    freqs = fft.rfftfreq(n_times, 1. / sfreq)
+
+    if x.ndim == 1:
+        return x - datafit[0], freqs[remove[0]]
+    return x - datafit, [freqs[r] for r in remove]
+
+
+def _fit_sinusoids(A: np.ndarray, remove: np.ndarray, n_times: int
+                   ) -> np.ndarray:
+    """Sum the sinusoids fitted at the removed frequencies of each channel.
+
+    Every fitted frequency sits on a bin of the length ``n_times`` rFFT, so
+    the sum of ``|2A| * cos(2 * pi * k * t / n_times + angle(2A))`` over the
+    removed bins k is the inverse rFFT of the sparse coefficient spectrum.
 
-    fits = list()
-    # make "time" vector
-    rads = 2 * np.pi * (np.arange(x.size) / float(sfreq))
-    for ind in indices:
-        c = 2 * A[0, ind]
-        fit = np.abs(c) * np.cos(freqs[ind] * rads + np.angle(c))
-        fits.append(fit)
+    Parameters
+    ----------
+    A : array, shape=(n_channels, n_freqs)
+        The complex amplitudes from the F-test.
+    remove : array of bool, shape=(n_channels, n_freqs)
+        The frequencies to remove from each channel.
+    n_times : int
+        The number of time points.
 
-    if len(fits) == 0:
-        datafit = 0.0
-    else:
-        # fitted sinusoids are summed, and subtracted from data
-        datafit = np.sum(fits, axis=0)
+    Returns
+    -------
+    datafit : array, shape=(n_channels, n_times)
+        The summed sinusoids.
+
+    Examples
+    --------
+    >>> A = np.zeros((1, 6), complex)
+    >>> A[0, 2] = 0.5j
+    >>> fit = _fit_sinusoids(A, np.abs(A) > 0, 10)
+    >>> np.allclose(fit, np.cos(2 * np.pi * 2 * np.arange(10) / 10 + np.pi/2))
+    True
+    """
+    datafit = np.zeros((A.shape[0], n_times))
+    chans = remove.any(axis=-1)
+    if not chans.any():
+        return datafit
 
-    return x - datafit, freqs[indices]
+    # irfft(S)[t] = 2 / n * Re(S[k] * exp(2j * pi * k * t / n)), 0 < k < n/2
+    spec = np.where(remove[chans], A[chans], 0) * n_times
+    # the DC and Nyquist bins are only counted once and must be real
+    spec[:, 0] = 2 * spec[:, 0].real
+    if n_times % 2 == 0:
+        spec[:, -1] = 2 * spec[:, -1].real
+    datafit[chans] = fft.irfft(spec, n=n_times, axis=-1)
+    return datafit
 
 
 def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
-            n_fft: int = None) -> tuple[np.ndarray, np.ndarray]:
+            n_fft: int | str = None, workers: int = 1,
+            dtype: np.dtype = np.float64, max_nbytes: int | str = '256M'
+            ) -> tuple[np.ndarray, np.ndarray]:
     """Compute significant tapered spectra.
 
     Parameters
@@ -302,33 +598,66 @@ def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
         The tapers
     sfreq : float
         The sampling frequency
-    n_fft : int | None
+    n_fft : int | 'fast' | None
         Length of the FFT. If None, the number of samples in the input signal
-        will be used.
+        will be used. If 'fast', the signal is zero padded to the next length
+        that ``scipy.fft`` transforms efficiently, which changes the frequency
+        grid.
+    workers : int
+        The number of threads for each FFT, as in ``scipy.fft``. Default is 1.
+    dtype : np.dtype
+        The float precision of the computation. With ``np.float32`` the
+        spectra are complex64, which halves memory use. Default is float64.
+    max_nbytes : int | str
+        The maximum size of the tapered signal held in memory at once, in
+        bytes or as a human-readable string. Tapers are applied and
+        transformed in blocks that fit. Default is '256M'.
 
     Returns
     -------
-    x_mt : array, shape=(..., n_tapers, n_times)
+    x_mt : array, shape=(..., n_tapers, n_freqs)
         The tapered spectra
     freqs : array
         The frequency points in Hz of the spectra
+
+    Examples
+    --------
+    >>> x = np.random.randn(2, 997)
+    >>> dpss = signal.windows.dpss(997, 4., 7)
+    >>> x_mt, freqs = spectra(x, dpss, 1000.)
+    >>> x_mt.shape, x_mt.dtype
+    ((2, 7, 499), dtype('complex128'))
+    >>> blocks, _ = spectra(x, dpss, 1000., max_nbytes=x.nbytes, workers=2)
+    >>> np.allclose(blocks, x_mt)
+    True
+    >>> x_mt, freqs = spectra(x, dpss, 1000., 'fast', dtype=np.float32)
+    >>> x_mt.shape, x_mt.dtype
+    ((2, 7, 501), dtype('complex64'))
     """
     if n_fft is None:
         n_fft = x.shape[-1]  # round(sfreq * round(x.shape[-1]*pad_fact/sfreq))
+    elif n_fft == 'fast':
+        n_fft = fft.next_fast_len(x.shape[-1], real=True)
+    if isinstance(max_nbytes, str):
+        max_nbytes = memstr_to_bytes(max_nbytes)
 
     # remove mean (do not use in-place subtraction as it may modify input x)
+    x = np.asarray(x, dtype=dtype)
     x = x - np.mean(x, axis=-1, keepdims=True)
+    dpss = np.asarray(dpss, dtype=dtype).reshape(-1, x.shape[-1])
 
     # only keep positive frequencies
     freqs = fft.rfftfreq(n_fft, 1. / sfreq)
 
-    # The following is equivalent to this, but uses less memory:
-    x_mt = fft.rfft(x[:, np.newaxis, :] * dpss, n=n_fft, workers=1)
-    # n_tapers = dpss.shape[0] if dpss.ndim > 1 else 1
-    # x_mt = np.zeros(x.shape[:-1] + (n_tapers, len(freqs)),
-    #                 dtype=np.complex128)
-    # for idx, sig in enumerate(x):
-    #     x_mt[idx] = fft.rfft(sig[..., np.newaxis, :] * dpss, n=n_fft)
+    # The tapered signal is only materialized for as many tapers as fit in
+    # max_nbytes, and each block is transformed into the output
+    x_mt = np.empty(x.shape[:-1] + (dpss.shape[0], freqs.size),
+                    dtype=np.result_type(dtype, np.complex64))
+    step = max(1, int(max_nbytes // max(x.nbytes, 1)))
+    for start in range(0, dpss.shape[0], step):
+        tapers = dpss[start:start + step]
+        x_mt[..., start:start + step, :] = fft.rfft(
+            x[..., np.newaxis, :] * tapers, n=n_fft, workers=workers)
     # Adjust DC and maybe Nyquist, depending on one-sided transform
     x_mt[..., 0] /= np.sqrt(2.)
     if n_fft % 2 == 0:
@@ -337,6 +666,7 @@ def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
 
 
 @fill_doc
+@cache_result
 @singledispatch
 @verbose
 def spectrogram(line: BaseEpochs, freqs: np.ndarray,
@@ -453,3 +783,46 @@ def _(line: base.BaseRaw, freqs: np.ndarray, line_event: str, tmin: float,
 
     return spectrogram(data, freqs, baseline, n_cycles, pad, correction,
                        **kwargs)
+
+
+if __name__ == '__main__':
+    from timeit import timeit
+
+    # compare the time to reconstruct the fitted sinusoids of one 10 s window
+    # with a 20 Hz notch, per frequency and as one inverse rFFT
+    sfreq, n_times, n_chans = 2000., 20000, 8
+    rng = np.random.default_rng(seed=42)
+    freqs = fft.rfftfreq(n_times, 1. / sfreq)
+    A = rng.standard_normal((n_chans, freqs.size)) + \
+        1j * rng.standard_normal((n_chans, freqs.size))
+    remove = np.broadcast_to((50 <= freqs) & (freqs <= 70), A.shape)
+
+    def loop_fit():
+        rads = 2 * np.pi * (np.arange(n_times) / sfreq)
+        datafit = np.zeros((n_chans, n_times))
+        for ch in range(n_chans):
+            for ind in np.flatnonzero(remove[ch]):
+                c = 2 * A[ch, ind]
+                datafit[ch] += np.abs(c) * np.cos(freqs[ind] * rads +
+                                                  np.angle(c))
+        return datafit
+
+    assert np.allclose(loop_fit(), _fit_sinusoids(A, remove, n_times))
+    runs = 10
+    time1 = timeit('loop_fit()', globals=globals(), number=runs)
+    time2 = timeit('_fit_sinusoids(A, remove, n_times)', globals=globals(),
+                   number=runs)
+    print(f'Time for cosine loop: {time1 / runs:.6f} seconds per window')
+    print(f'Time for inverse rFFT: {time2 / runs:.6f} seconds per window')
+
+    # compare line removal with the F-test in every window to detecting the
+    # line components once, on 8 windows of 2 minutes of data
+    x = rng.standard_normal((n_chans, 240000)) + \
+        np.sin(2 * np.pi * 60 * np.arange(240000) / sfreq)
+    args = (sfreq, [60.], [20.], n_times, True, True, None, 0.05)
+    full, fast = WindowingRemover(*args), WindowingRemover(*args, n_detect=8)
+    time1 = timeit('full(x)', globals=globals(), number=1)
+    time2 = timeit('fast(x)', globals=globals(), number=1)
+    print(f'Time with the F-test per window: {time1:.6f} seconds')
+    print(f'Time with detection on 8 windows: {time2:.6f} seconds '
+          f'(deviation {fast.deviation:.2%})')
@@ -10,7 +10,7 @@ import numpy as np
 from mne.viz import Brain
 
 from ieeg import PathLike, Signal
-from ieeg.io import get_elec_volume_labels
+from ieeg.io import Catalog, elec_volume_labels
 from ieeg.viz import _qt_backend, parula
 
 _qt_backend()
@@ -661,7 +661,8 @@ def _add_labels(fig, info, sub, every, hemi, lr, **kwargs):
 
 
 def subject_to_info(subject: str, subjects_dir: PathLike = None,
-                    ch_types: str = "seeg", sfreq: int = 2000) -> mne.Info:
+                    ch_types: str = "seeg", sfreq: int = 2000,
+                    catalog: Catalog = None) -> mne.Info:
     """Gets the info for a subject from the subjects directory
 
     Parameters
@@ -674,15 +675,21 @@ def subject_to_info(subject: str, subjects_dir: PathLike = None,
         The channel type, by default "seeg"
     sfreq : int, optional
         The sampling frequency, by default 2000
+    catalog : Catalog, optional
+        A catalog of the subjects directory to look the electrode file up in,
+        by default None
 
     Returns
     -------
     mne.Info
         The info for the subject
     """
-    subjects_dir = get_sub_dir(subjects_dir)
-    elec_file = op.join(subjects_dir, subject, 'elec_recon',
-                        subject + '_elec_locations_RAS_brainshifted.txt')
+    fname = subject + '_elec_locations_RAS_brainshifted.txt'
+    if catalog is not None:
+        elec_file = catalog.recon_file(subject, fname)
+    else:
+        subjects_dir = get_sub_dir(subjects_dir)
+        elec_file = op.join(subjects_dir, subject, 'elec_recon', fname)
     elecs = dict()
     with open(elec_file, 'r') as fd:
         reader = csv.reader(fd)
@@ -752,29 +759,10 @@ def gen_labels(info: mne.Info, sub: str = None, subj_dir: str = None,
     montage = info.get_montage()
     force2frame(montage, 'mri')
     # aseg = 'aparc.a2009s+aseg'  # parcellation/anatomical segmentation atlas
-    labels = get_elec_volume_labels(sub, subj_dir, 10, atlas)
-    new_labels = OrderedDict()
+    labels = elec_volume_labels(sub, subj_dir, 10, atlas)
     if picks is None:
         picks = info.ch_names
-    bad_words = ('Unknown', 'unknown', 'hypointensities', 'White-Matter')
-    for p in picks:
-        i = 2
-        label = labels.T[p].T
-        if label[0] not in bad_words:
-            new_labels[p] = label[0]
-            continue
-        while not ((not any(w in label[i] for w in bad_words)) and
-                   float(label[i + 1]) > 0.05):
-            if (i + 2) >= len(label.T):  # end of labels
-                i = 0
-                break
-            elif label[i + 2].isspace():  # empty label
-                i = 0
-                break
-            else:
-                i += 2
-        new_labels[p] = label[i]
-    return new_labels
+    return OrderedDict(zip(picks, labels.first_label(picks).tolist()))
 
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 import ieeg.viz.utils
 from ieeg.io import get_data, raw_from_layout
-from ieeg.navigate import crop_empty_data, channel_outlier_marker, trial_ieeg
+from ieeg.navigate import (crop_empty_data, channel_outlier_marker,
+                           outliers_to_nan, trial_ieeg_batch)
+from ieeg.process import ResultCache
 from ieeg.timefreq import gamma, utils
 from ieeg.calc import stats, scaling
 import numpy as np
@@ -20,7 +22,7 @@ else:  # if not then set box directory
 # Load the data
 TASK = "SentenceRep"
 subj = "D" + str(subject).zfill(4)
-layout = get_data("SentenceRep", root=LAB_root)
+layout = get_data("SentenceRep", root=LAB_root, cache=True)
 filt = raw_from_layout(layout.derivatives['clean'], subject=subj,
                        extension='.edf', desc='clean', preload=False)
 
@@ -46,23 +48,19 @@ from events import fix_annotations  # noqa E402
 fix_annotations(good)
 
 # %% High Gamma Filter and epoching
-out = []
-for epoch, t in zip(("Start", "Word/Response/LS", "Word/Audio/LS",
-                     "Word/Audio/LM", "Word/Audio/JL", "Word/Speak/LS",
-                     "Word/Mime/LM", "Word/Audio/JL"),
-                    ((-0.5, 0), (-1, 1), (-0.5, 1.5), (-0.5, 1.5), (-0.5, 1.5),
-                     (-0.5, 1.5), (-0.5, 1.5), (1, 3))):
-    times = [None, None]
-    times[0] = t[0] - 0.5
-    times[1] = t[1] + 0.5
-    trials = trial_ieeg(good, epoch, times, preload=True, outliers=10)
-    gamma.extract(trials, copy=False, n_jobs=1)
-    utils.crop_pad(trials, "0.5s")
-    trials.resample(100)
-    trials.filenames = good.filenames
-    out.append(trials)
-    # if len(out) == 2:
-    #     break
+windows = [(epoch, (t[0] - 0.5, t[1] + 0.5)) for epoch, t in zip(
+    ("Start", "Word/Response/LS", "Word/Audio/LS", "Word/Audio/LM",
+     "Word/Audio/JL", "Word/Speak/LS", "Word/Mime/LM", "Word/Audio/JL"),
+    ((-0.5, 0), (-1, 1), (-0.5, 1.5), (-0.5, 1.5), (-0.5, 1.5), (-0.5, 1.5),
+     (-0.5, 1.5), (1, 3)))]
+out = trial_ieeg_batch(good, windows, preload=True)
+with ResultCache():
+    for trials in out:
+        outliers_to_nan(trials, outliers=10)
+        gamma.extract(trials, copy=False, n_jobs=1)
+        utils.crop_pad(trials, "0.5s")
+        trials.resample(100)
+        trials.filenames = good.filenames
 
 base = out.pop(0)
 
@@ -19,6 +19,15 @@ def test_bids():
     assert "pt1" in layout.get_subjects()
 
 
+def test_cached_layout(tmp_path):
+    from ieeg.io import cached_layout
+    cached = cached_layout(bids_root, tmp_path)
+    assert (tmp_path / "layout_index.sqlite").is_file()
+    assert cached.get_subjects() == layout.get_subjects()
+    reloaded = cached_layout(bids_root, tmp_path)
+    assert len(reloaded.get()) == len(layout.get())
+
+
 def test_bidspath_from_layout():
     from ieeg.io import bidspath_from_layout
     expected = "sub-pt1_ses-presurgery_task-ictal_ieeg.eeg"
@@ -33,6 +42,104 @@ def test_raw_from_layout():
     assert isinstance(raw, BaseRaw)
 
 
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_raw_from_layout_runs(tmp_path, monkeypatch, n_jobs):
+    from mne_bids import read_raw_bids, write_raw_bids
+    paths = [BIDSPath(subject="01", task="test", run=i + 1, datatype="ieeg",
+                      root=tmp_path) for i in range(2)]
+    for i, path in enumerate(paths):
+        write_raw_bids(seeg.copy().crop(4 * i, 4 * i + 4), path,
+                       format="EDF", allow_preload=True, verbose=False)
+    closed = []
+    monkeypatch.setattr(BaseRaw, "close", lambda self: closed.append(self))
+    raw = raw_from_layout(BIDSLayout(tmp_path), subject="01",
+                          extension=".edf", n_jobs=n_jobs, verbose=False)
+    # the concatenated raw and the reader of the second run are closed
+    assert len(closed) == 2 and closed[0] is raw
+    monkeypatch.undo()
+    expected = mne.concatenate_raws([read_raw_bids(p, verbose=False)
+                                     for p in paths]).load_data()
+    assert raw.preload
+    assert np.array_equal(raw._data, expected._data)
+    assert np.sum(raw.annotations.description == 'BAD boundary') == 1
+
+
+def test_save_derivative_fif(tmp_path):
+    import json
+    import pandas as pd
+    from mne_bids import write_raw_bids
+    from ieeg.io import save_derivative
+    for i in range(2):
+        write_raw_bids(seeg.copy().crop(4 * i, 4 * i + 4),
+                       BIDSPath(subject="01", task="test", run=i + 1,
+                                datatype="ieeg", root=tmp_path),
+                       format="EDF", allow_preload=True, verbose=False)
+    raw = raw_from_layout(BIDSLayout(tmp_path), subject="01",
+                          extension=".edf", verbose=False)
+    save_derivative(raw, BIDSLayout(tmp_path), "clean", format="FIF",
+                    n_jobs=2)
+    derivs = BIDSLayout(tmp_path, derivatives=True).derivatives["clean"]
+    out = raw_from_layout(derivs, subject="01", extension=".fif",
+                          desc="clean", verbose=False)
+    assert out.n_times == raw.n_times
+    assert np.allclose(out._data, raw._data, rtol=1e-6, atol=0)
+    assert np.sum(out.annotations.description == 'BAD boundary') == 1
+    for file in out.filenames:
+        chans = pd.read_csv(str(file).replace("_ieeg.fif", "_channels.tsv"),
+                            sep='\t')
+        assert chans['name'].tolist() == raw.ch_names
+        sidecar = str(file).replace(".fif", ".json")
+        with open(sidecar) as f:
+            assert json.load(f)['SamplingFrequency'] == raw.info['sfreq']
+
+
+def test_update_channels(tmp_path):
+    from mne_bids import read_raw_bids, write_raw_bids
+    from ieeg.io import get_bad_chans, update
+    for i in range(2):
+        write_raw_bids(seeg.copy().crop(4 * i, 4 * i + 4),
+                       BIDSPath(subject="01", task="test", run=i + 1,
+                                datatype="ieeg", root=tmp_path),
+                       format="EDF", allow_preload=True, verbose=False)
+    layout = BIDSLayout(tmp_path)
+    raw = raw_from_layout(layout, subject="01", extension=".edf",
+                          verbose=False)
+    raw.info['bads'] = raw.ch_names[:2]
+    update(raw, layout, "noisy", n_jobs=2)
+    for file in raw.filenames:
+        assert get_bad_chans(str(file)) == raw.ch_names[:2]
+    run = read_raw_bids(BIDSPath(subject="01", task="test", run=1,
+                                 datatype="ieeg", root=tmp_path),
+                        verbose=False)
+    assert run.info['bads'] == raw.ch_names[:2]
+    raw.info['bads'] = []
+    update(raw, layout)
+    for file in raw.filenames:
+        assert get_bad_chans(str(file)) == []
+
+
+def test_outlier_save(tmp_path):
+    from mne_bids import write_raw_bids
+    from mne_bids.tsv_handler import _from_tsv
+    from ieeg.io import get_bad_chans
+    from ieeg.navigate import channel_outlier_marker
+    noisy = seeg.copy().pick(range(8)).crop(0, 4).load_data()
+    noisy._data[3] *= 50
+    write_raw_bids(noisy, BIDSPath(subject="01", task="test", datatype="ieeg",
+                                   root=tmp_path),
+                   format="EDF", allow_preload=True, verbose=False)
+    raw = raw_from_layout(BIDSLayout(tmp_path), subject="01",
+                          extension=".edf", verbose=False)
+    bads = channel_outlier_marker(raw, 2, 1, save=True, verbose=False)
+    assert bads == [raw.ch_names[3]]
+    # outliers are saved as bad channels, with the round they were found in
+    for file in raw.filenames:
+        assert get_bad_chans(str(file)) == bads
+        chans = _from_tsv(
+            str(file).replace("_ieeg.edf", "_channels.tsv"))
+        assert chans['status_description'][3].startswith("outlier round 1")
+
+
 @pytest.mark.parametrize("n_jobs", [1, 8])
 def test_line_filter(n_jobs):
     from ieeg.mt_filter import line_filter
@@ -53,6 +160,183 @@ def test_line_filter(n_jobs):
     assert np.mean(np.abs(rpsd.get_data() - fpsd.get_data())) > 1e-10
 
 
+@pytest.mark.parametrize("memmap", [True, False, "filt.dat"])
+def test_line_filter_stream(tmp_path, memmap):
+    import gc
+    from ieeg.mt_filter import line_filter
+    seeg.copy().pick(range(6)).crop(0, 8).save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=True)
+    expected = line_filter(raw, freqs=[60], filter_length='2s', n_jobs=1)
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=False)
+    if isinstance(memmap, str):
+        memmap = tmp_path / memmap
+    filt = line_filter(raw, freqs=[60], filter_length='2s', memmap=memmap)
+    assert not raw.preload
+    assert filt.preload
+    assert isinstance(filt._data, np.memmap) == (memmap is True)
+    assert np.allclose(filt.get_data(), expected.get_data())
+    if memmap not in (True, False):
+        # a file given by path outlives the Raw
+        del filt
+        gc.collect()
+        saved = np.fromfile(memmap).reshape(expected._data.shape)
+        assert np.allclose(saved, expected.get_data())
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_extract_batched(monkeypatch, n_jobs):
+    from functools import partial
+    from ieeg.timefreq import gamma
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((4, 5, 1000))
+    expected = np.stack([gamma.filterbank_hilbert(
+        trial.T, 500, [70, 150], 1).sum(-1).T for trial in data])
+    # blocks of 3 of the 20 trial x channel rows
+    monkeypatch.setattr(gamma, "_envelope_batch", partial(
+        gamma._envelope_batch, max_nbytes=3 * 2 * 8 * 1000))
+    out = gamma.extract(data, 500, n_jobs=n_jobs, verbose=False)
+    assert out.shape == data.shape
+    assert np.allclose(out, expected, rtol=1e-4, atol=0)
+
+
+def test_extract_stream(tmp_path):
+    import gc
+    from ieeg.timefreq.gamma import _stream_envelope, extract
+    seeg.copy().pick(range(4)).crop(0, 8).save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=True)
+    expected = extract(raw, n_jobs=1, verbose=False).get_data()
+    in_memory = extract(raw, n_jobs=1, segment='2s').get_data()
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=False)
+    filt = extract(raw, n_jobs=1, segment='2s')
+    assert not raw.preload
+    assert isinstance(filt._data, np.memmap)
+    assert np.allclose(filt.get_data(), in_memory)
+    sfreq = int(raw.info['sfreq'])
+    inner = slice(sfreq, -sfreq)
+    assert np.median(np.abs(in_memory - expected)[:, inner] /
+                     expected[:, inner]) < 0.01
+
+    # a file given by path outlives the Raw
+    fname = tmp_path / "gamma.dat"
+    filt = extract(raw, n_jobs=1, segment='2s', memmap=fname)
+    assert not isinstance(filt._data, np.memmap)
+    del filt
+    gc.collect()
+    assert np.allclose(np.fromfile(fname).reshape(in_memory.shape),
+                       in_memory)
+    with pytest.raises(ValueError, match="too short"):
+        _stream_envelope(lambda start, stop: in_memory[:, start:stop - 1],
+                         np.empty(in_memory.shape), sfreq, (70, 150), sfreq)
+
+
+def test_extract_dtype(tmp_path):
+    from ieeg.timefreq.gamma import extract
+    seeg.copy().pick(range(4)).crop(0, 4).save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=False)
+    expected = extract(raw, n_jobs=1, segment='2s', memmap=False).get_data()
+    out = extract(raw, n_jobs=1, segment='2s', memmap=False,
+                  dtype=np.float32)
+    assert out._data.dtype == np.float32
+    assert np.allclose(out.get_data(), expected, rtol=1e-4, atol=0)
+    epochs = mne.make_fixed_length_epochs(raw, 1., preload=True,
+                                          verbose=False)
+    for inst in (epochs, epochs.average()):
+        out = extract(inst, n_jobs=1, verbose=False, dtype=np.float32)
+        assert out._data.dtype == np.float32
+        assert np.allclose(out._data, extract(
+            inst, n_jobs=1, verbose=False)._data, rtol=1e-4, atol=0)
+
+
+def test_windowing_remover_block():
+    from ieeg.timefreq.multitaper import WindowingRemover
+    rng = np.random.default_rng(42)
+    t = np.arange(6000) / 1000
+    x = rng.standard_normal((6, t.size)) + rng.uniform(0, 3, (6, 1)) * \
+        np.sin(2 * np.pi * 60 * t + rng.uniform(0, 6, (6, 1)))
+    args = (1000., np.array([60.]), np.array([10.]), 1000, True, True, None,
+            0.05)
+    single = WindowingRemover(*args)
+    expected = np.stack([single(ch) for ch in x])
+    block = WindowingRemover(*args)
+    assert np.allclose(block(x), expected)
+    n_win = len(single.rm_freqs) // len(x)
+    per_chan = [single.rm_freqs[c * n_win + w] for w in range(n_win)
+                for c in range(len(x))]
+    assert len(block.rm_freqs) == len(per_chan)
+    for a, b in zip(block.rm_freqs, per_chan):
+        assert np.array_equal(a, b)
+
+
+def test_windowing_remover_detect():
+    from ieeg.timefreq.multitaper import WindowingRemover
+    rng = np.random.default_rng(42)
+    t = np.arange(20000) / 1000
+    x = rng.standard_normal((4, t.size)) + rng.uniform(1, 3, (4, 1)) * \
+        np.sin(2 * np.pi * 60 * t + rng.uniform(0, 6, (4, 1)))
+    args = (1000., np.array([60.]), np.array([10.]), 1000, True, True, None,
+            0.05)
+    full = WindowingRemover(*args)(x)
+    fast = WindowingRemover(*args, n_detect=5)
+    out = fast(x)
+    assert fast.deviation < 0.05
+    assert np.array_equal(np.nonzero(fast.fixed)[1], [60] * 4)
+    assert all(np.array_equal(f, [60.]) for f in fast.rm_freqs)
+    assert np.std(out - full) < 0.05 * np.std(full)
+
+
+def test_dpss_cache(tmp_path):
+    from ieeg.timefreq.multitaper import (WindowingRemover, _dpss,
+                                          set_dpss_cache)
+    args = (1000., [60.], [10.], 1000, True, True, None, 0.05)
+    window_fun, thresh = WindowingRemover(*args).get_thresh()
+    assert WindowingRemover(*args).get_thresh()[0] is window_fun
+    assert not window_fun.flags.writeable
+    try:
+        assert set_dpss_cache(tmp_path) == str(tmp_path)
+        stored = WindowingRemover(*args).get_thresh()
+        assert len(os.listdir(tmp_path)) == 1
+        _dpss.cache_clear()
+        loaded = WindowingRemover(*args).get_thresh()
+        assert loaded[0] is not stored[0]
+        assert np.array_equal(loaded[0], window_fun)
+        assert loaded[1] == thresh
+    finally:
+        set_dpss_cache(False)
+
+
+def test_line_filter_cached(tmp_path):
+    from ieeg.mt_filter import line_filter
+    from ieeg.process import ResultCache
+    raw = seeg.copy().pick(range(4)).load_data()
+    expected = line_filter(raw, freqs=[60], filter_length='5s', n_jobs=1)
+    with ResultCache(tmp_path) as cache:
+        for _ in range(2):
+            filt = raw.copy()
+            out = line_filter(filt, freqs=[60], filter_length='5s',
+                              n_jobs=1, copy=False)
+            assert out is filt
+            assert np.allclose(filt._data, expected._data)
+        # copy=False given by position is also applied in place on a hit
+        filt = raw.copy()
+        out = line_filter(filt, None, [60], '5s', 10., None, 0.05, None, 1,
+                          True, True, False)
+        assert out is filt
+        assert np.allclose(filt._data, expected._data)
+        assert len(os.listdir(tmp_path)) == 1
+    cache.bytes_limit = 0
+    cache.reduce_size()
+    assert not os.listdir(tmp_path)
+
+
+def test_line_filter_progress(capsys):
+    from ieeg.mt_filter import line_filter
+    raw = seeg.copy().pick(range(4)).crop(0, 5).load_data()
+    line_filter(raw, freqs=[60], filter_length='1s', n_jobs=1, verbose=True)
+    assert "Channels" in capsys.readouterr().err
+    line_filter(raw, freqs=[60], filter_length='1s', n_jobs=1, verbose=False)
+    assert "Channels" not in capsys.readouterr().err
+
+
 if os.path.isfile("spec.npy"):
     spec_check = np.load("spec.npy")
 else:
@@ -94,6 +378,121 @@ def test_outlier(input1, input2, expected):
     assert outs == expected
 
 
+@pytest.mark.parametrize("chunk_size", [10000, "3s"])
+def test_outlier_streaming(tmp_path, chunk_size):
+    from ieeg.navigate import channel_outlier_marker
+    raw = seeg.copy().load_data()
+    raw.save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=False)
+    outs = channel_outlier_marker(raw, 3, 2, chunk_size=chunk_size)
+    assert not raw.preload
+    assert outs == channel_outlier_marker(raw, 3, 2)
+
+
+@pytest.mark.parametrize("picks", [None, [0, 2, 4], [0, 3, 2]])
+def test_trial_ieeg_view(picks):
+    from ieeg.navigate import outliers_to_nan, trial_ieeg
+    from ieeg.timefreq import gamma
+    from ieeg.timefreq.utils import crop_pad
+    raw = seeg.copy().load_data()
+    raw.set_annotations(mne.Annotations(
+        [1., 2., 3., 4., 5., 6., 7., 4.5], [0.] * 7 + [1.],
+        ['a', 'b', 'a/x', 'b/x', 'c', 'a', 'b', 'BAD seg']))
+    orig = raw.get_data()
+    for event in ('a', 'b'):
+        expected = trial_ieeg(raw, event, (-0.5, 1), preload=True,
+                              picks=picks)
+        view = trial_ieeg(raw, event, (-0.5, 1), view=True, picks=picks)
+        assert isinstance(view, mne.BaseEpochs)
+        assert np.array_equal(view.get_data(), expected.get_data())
+        assert np.array_equal(view.events, expected.events)
+        assert np.array_equal(view.selection, expected.selection)
+        assert np.allclose(view.average().data, expected.average().data)
+        if event == 'a':
+            assert np.array_equal(view['a/x'].get_data(),
+                                  expected['a/x'].get_data())
+
+    # evenly spaced trials of evenly spaced channels share the raw data
+    shared = np.shares_memory(view.get_data(copy=False), raw._data)
+    assert shared == (picks != [0, 3, 2])
+    env = gamma.extract(view, n_jobs=1, verbose=False)
+    assert np.allclose(env.get_data(), gamma.extract(
+        expected, n_jobs=1, verbose=False).get_data())
+    crop_pad(view, "0.2s")
+    crop_pad(expected, "0.2s")
+    assert np.array_equal(view.get_data(), expected.get_data())
+    assert shared == np.shares_memory(view.get_data(copy=False), raw._data)
+    assert outliers_to_nan(view, 0.5) is view
+    assert np.isnan(view.get_data()).any()
+    assert np.array_equal(view.get_data(),
+                          outliers_to_nan(expected, 0.5).get_data(),
+                          equal_nan=True)
+    assert np.array_equal(raw._data, orig)
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_trial_ieeg_batch(tmp_path, preload):
+    from ieeg.navigate import trial_ieeg, trial_ieeg_batch
+    raw = seeg.copy().load_data()
+    raw.set_annotations(mne.Annotations(
+        [1., 2., 3., 4., 5., 6., 4.5], [0.] * 6 + [1.],
+        ['a', 'b', 'a/x', 'b/x', 'c', 'a', 'BAD seg']))
+    raw.save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=preload)
+    windows = [('a', (-0.5, 1)), (('b', 'c'), (-0.2, 0.2)), ('a', (0, 1.5))]
+    out = trial_ieeg_batch(raw, windows, preload=True, verbose=False)
+    assert raw.preload == preload
+    for epochs, (event, times) in zip(out, windows):
+        if isinstance(event, tuple):
+            event = list(event)
+        expected = trial_ieeg(raw, event, times, preload=True, verbose=False)
+        assert np.array_equal(epochs.get_data(), expected.get_data())
+        assert np.array_equal(epochs.events, expected.events)
+        assert epochs.drop_log == expected.drop_log
+
+
+def test_trial_ieeg_batch_sparse(tmp_path, monkeypatch):
+    from ieeg.navigate import trial_ieeg, trial_ieeg_batch
+    raw = seeg.copy().load_data()
+    raw.set_annotations(mne.Annotations([1., 3., 6.], 0., ['a'] * 3))
+    raw.save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif")
+    expected = trial_ieeg(raw, 'a', (-0.1, 0.1), preload=True, verbose=False)
+
+    reads = []
+    read_segment = mne.io.Raw._read_segment_file
+
+    def spy(self, data, idx, fi, start, stop, cals, mult):
+        reads.append(stop - start)
+        return read_segment(self, data, idx, fi, start, stop, cals, mult)
+
+    monkeypatch.setattr(mne.io.Raw, '_read_segment_file', spy)
+    out, = trial_ieeg_batch(raw, {'a': (-0.1, 0.1)}, preload=True,
+                            verbose=False)
+    assert np.array_equal(out.get_data(), expected.get_data())
+    # only the three 0.2 s windows are read, not the 5 s between them
+    assert sum(reads) <= 3 * (0.2 * raw.info['sfreq'] + 1)
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_crop_empty_data(tmp_path, preload):
+    from ieeg.navigate import crop_empty_data
+    raw = seeg.copy().load_data()
+    raw.set_annotations(mne.Annotations(
+        [1., 2., 3., 6., 7.], 0., ['a', 'b', 'boundary', 'c', 'd']))
+    raw.save(tmp_path / "raw.fif")
+    raw = mne.io.read_raw_fif(tmp_path / "raw.fif", preload=preload)
+    out = crop_empty_data(raw, start_pad="0.5s", end_pad="0.5s")
+    expected = mne.concatenate_raws([raw.copy().crop(0.5, 2.5),
+                                     raw.copy().crop(5.5, 7.5)])
+    assert np.array_equal(out.get_data(), expected.get_data())
+    assert np.array_equal(out.annotations.onset, expected.annotations.onset)
+    assert list(out.annotations.description) == \
+        list(expected.annotations.description)
+    if preload:
+        assert not np.shares_memory(out._data, raw._data)
+
+
 @pytest.mark.parametrize("outliers, n_out", [
     (4, 89955),
     (5, 25987)
@@ -103,3 +502,97 @@ def test_trial_outlier(outliers, n_out):
     trials = trial_ieeg(seeg, 'Response', (-1, 1))
     outs = outliers_to_nan(trials, outliers)
     assert np.isnan(outs._data).sum() == n_out
+
+
+def test_outlier_mask():
+    from ieeg.navigate import outliers_to_nan
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((50, 4, 100))
+    data[3, 1] *= 20
+    data[7, 3] *= 20
+    info = mne.create_info(4, 100., ['seeg', 'seeg', 'misc', 'seeg'])
+    trials = mne.EpochsArray(data, info, verbose=False)
+    keep = outliers_to_nan(trials, 6, return_mask=True)
+    assert keep.shape == (50, 3)
+    assert np.array_equal(np.argwhere(~keep), [[3, 1], [7, 2]])
+    assert not np.isnan(trials._data).any()
+    out = outliers_to_nan(trials, 6)
+    assert out is trials
+    assert np.array_equal(np.argwhere(np.isnan(trials._data[..., 0])),
+                          [[3, 1], [7, 3]])
+    assert np.array_equal(trials._data[~np.isnan(trials._data)],
+                          data[~np.isnan(trials._data)])
+    assert outliers_to_nan(trials, 6, picks=[], return_mask=True).shape == \
+        (50, 0)
+    assert outliers_to_nan(trials, 6, picks=[]) is trials
+
+
+def test_open_dat_file(tmp_path):
+    from ieeg.io import open_dat_file
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((5000, 4)).astype('float32')
+    fname = tmp_path / "sub_ieeg.dat"
+    data.tofile(fname)
+    raw = open_dat_file(fname, ['a', 'b', 'Trigger', 'c', 'd'], 1000,
+                        preload=False)
+    assert not raw.preload
+    expected = data.T * 1e-6
+    assert np.allclose(raw.get_data(), expected)
+    assert np.allclose(raw.get_data(picks=['c', 'a'], start=10, stop=900),
+                       expected[[2, 0], 10:900])
+    raw.crop(1, 3).load_data()
+    assert np.allclose(raw._data, expected[:, 1000:3001])
+    loaded = open_dat_file(fname, ['a', 'b', 'Trigger', 'c', 'd'], 1000)
+    assert loaded.preload
+    assert np.allclose(loaded._data, expected)
+
+
+def test_elec_volume_labels(tmp_path):
+    from ieeg.io import elec_volume_labels, get_elec_volume_labels
+    recon = tmp_path / "D1" / "elec_recon"
+    recon.mkdir(parents=True)
+    rows = ["label,name,l1,p1,l2,p2",
+            "G_front,A1,G_front,0.9,Unknown,0.1",
+            "Unknown,A2,Left-Cerebral-White-Matter,0.7,S_temp,0.3",
+            "Unknown,A3,Unknown,0.98,S_temp,0.02",
+            "Unknown,A4,Right-Amygdala,0.6, , "]
+    (recon / "D1_elec_location_radius_10mm_aparc.a2009s+aseg.mgz.csv"
+     ).write_text("\n".join(rows))
+    labels = elec_volume_labels("D1", tmp_path)
+    assert labels.first_label().tolist() == [
+        "G_front", "S_temp", "Unknown", "Right-Amygdala"]
+    assert elec_volume_labels("D1", tmp_path) is labels
+    assert list(recon.glob("*_labels.npz"))
+    df = get_elec_volume_labels("D1", str(tmp_path))
+    assert list(df.index) == ["A1", "A2", "A3", "A4"]
+
+
+def test_catalog(tmp_path):
+    from ieeg.io import Catalog, find_dat
+    lab = tmp_path / "lab"
+    bids = lab / "BIDS-1.0_Test" / "BIDS"
+    bids.mkdir(parents=True)
+    (bids / "dataset_description.json").write_text("{}")
+    (bids / "sub-01").mkdir()
+    data = lab / "D_Data" / "Test" / "D1"
+    data.mkdir(parents=True)
+    for name in ("D1_ieeg.dat", "D1_cleanieeg.dat"):
+        (data / name).write_bytes(b"0000")
+    catalog = Catalog(lab)
+    assert catalog.bids_root("Test") == str(bids)
+    assert "BIDS-1.0_Test/BIDS/sub-01" not in catalog.dirs
+    assert find_dat(data, catalog) == find_dat(data)
+    assert len(catalog.records()) == 3
+
+    stale = (data / "D1_cleanieeg.dat").stat().st_mtime_ns
+    with open(data / "D1_cleanieeg.dat", "r+b") as f:
+        f.write(b"00000000")
+    os.utime(data / "D1_cleanieeg.dat", ns=(stale + 10 ** 9,) * 2)
+    records = Catalog(lab).records().set_index('path')
+    assert records.loc[str(data / "D1_cleanieeg.dat"), 'size'] == 8
+    assert records.loc[str(data / "D1_cleanieeg.dat"), 'mtime'] > stale
+
+    (data / "D1_ieeg.dat").unlink()
+    catalog = Catalog(lab)
+    with pytest.raises(FileNotFoundError):
+        find_dat(data, catalog)
@@ -269,3 +269,65 @@ def test_set_array_val(idx, val, expected):
     ad = LabeledArray([[[1, 2]]], labels=[('a',), ('b',), ('c', 'd')])
     ad[idx] = val
     np.testing.assert_array_equal(ad.__array__(), np.array(expected))
+
+
+@pytest.mark.parametrize("func", ['sum', 'nanmean', 'std', 'nanvar', 'max'])
+@pytest.mark.parametrize("axis", [None, 0, (0, 2), 1])
+def test_epoch_store_reduce(tmp_path, func, axis):
+    from ieeg.calc.store import EpochStore
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((11, 3, 5))
+    data[rng.random(data.shape) < 0.1] = np.nan
+    store = EpochStore(tmp_path / "store.h5", chunk_size=2)
+    for i in range(0, 11, 4):
+        store.append(data[i:i + 4])
+    expected = getattr(np, func)(data, axis=axis)
+    out = store.reduce(func, axis, block_size=3, n_jobs=2)
+    assert np.allclose(np.asarray(out), expected, equal_nan=True)
+
+
+def test_epoch_store_chunks(tmp_path):
+    import h5py
+    from ieeg.calc.store import EpochStore
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((3, 10, 5000))
+    chans = [f'LTG{i}' for i in range(1, 11)]
+    store = EpochStore(tmp_path / "store.h5")
+    store.append(LabeledArray(data, [('a', 'b', 'a'), chans,
+                                     np.arange(5000).astype(str)]))
+    with h5py.File(store.fname, 'r') as f:
+        assert f['data'].chunks == (1, 8, 4096)
+    out = store[..., 'LTG1', :]
+    assert np.array_equal(out, data[:, 0])
+    assert np.array_equal(out.labels[0], ['a', 'b', 'a'])
+    assert np.array_equal(store['b', 'LTG10', 4090:], data[1, 9, 4090:])
+
+
+def test_epoch_store_labels(tmp_path):
+    from ieeg.calc.store import EpochStore
+    store = EpochStore(tmp_path / "store.h5", axis=1)
+    store.append(LabeledArray(np.ones((2, 2, 3)),
+                              [('a', 'b'), ('c1', 'c2'), ('0', '1', '2')]))
+    store.append(LabeledArray(np.arange(3.).reshape(1, 1, 3),
+                              [('a',), ('c3',), ('2', '1', '0')]))
+    out = store['b', ('c3', 'c1')]
+    assert np.array_equal(out.labels[0], ['c3', 'c1'])
+    assert np.isnan(out[0]).all()
+    assert np.array_equal(store['a', 'c3'], [2., 1., 0.])
+
+    # labels that are not in the store are rejected, not placed by position
+    other = EpochStore(tmp_path / "other.h5")
+    other.append(LabeledArray(np.ones((2, 2, 2)),
+                              [('a', 'b'), ('A1', 'A2'), ('0.0', '0.1')]))
+    with pytest.raises(ValueError, match="B7"):
+        other.append(LabeledArray(np.zeros((1, 2, 2)),
+                                  [('c',), ('B7', 'B9'), ('0.0', '0.1')]))
+    with pytest.raises(ValueError, match="1.1"):
+        other.append(LabeledArray(np.zeros((1, 2, 2)),
+                                  [('c',), ('A1', 'A2'), ('1.0', '1.1')]))
+    assert other.shape == (2, 2, 2)
+    # a subset of the labels is aligned and padded with NaN
+    other.append(LabeledArray(np.zeros((1, 1, 2)),
+                              [('c',), ('A2',), ('0.1', '0.0')]))
+    assert np.isnan(other['c', 'A1']).all()
+    assert np.array_equal(other['c', 'A2'], [0., 0.])
@@ -101,3 +101,71 @@ def test_window_averaged_shuffle():
     p = window_averaged_shuffle(field, base, 10000, 1, 1)
     t = np.isclose(np.array([0.51315, 0.99920, 6.9993e-04]), p, 0, 0.05)
     assert np.all(t)
+
+
+def _outlier_rounds(sig, sd, rounds):
+    # recompute the cutoff over the remaining channels every round, which
+    # stops when the only outlier is the first remaining channel
+    expected = []
+    inds = np.arange(sig.size)
+    rem = sig
+    i = 1
+    while i <= rounds:
+        cutoff = sd * np.std(rem) + np.mean(rem)
+        if not np.any(np.flatnonzero(rem > cutoff)):
+            break
+        expected += [(int(j), i) for j in inds[rem > cutoff]]
+        inds, rem = inds[rem < cutoff], rem[rem < cutoff]
+        i += 1
+    return expected
+
+
+@pytest.mark.parametrize("sd, rounds, n, seed", [
+    (2, np.inf, 250, 42), (3, 2, 250, 42), (1.5, 1, 250, 42),
+    (1, np.inf, 250, 42), (1, np.inf, 3, 4), (1, np.inf, 8, 6),
+    (1, np.inf, 5, 15)])
+def test_sig_outliers(sd, rounds, n, seed):
+    from ieeg.calc.stats import sig_outliers
+    # with sd=1 the last two channels lie exactly on the cutoff
+    rng = np.random.default_rng(seed)
+    sig = rng.lognormal(0, 1.5, n)
+    assert list(sig_outliers(sig, sd, rounds)) == _outlier_rounds(sig, sd,
+                                                                  rounds)
+
+
+def test_sig_outliers_tie():
+    from ieeg.calc.stats import sig_outliers
+    # one channel above 100 equal ones lies on the cutoff for sd=10, and the
+    # equal channels lie on it once that one is removed
+    for k in np.linspace(0.5, 100, 400):
+        for pos in (0, 50, 100):
+            sig = np.full(101, 3.)
+            sig[pos] += k
+            assert list(sig_outliers(sig, 10)) == _outlier_rounds(sig, 10,
+                                                                  np.inf)
+
+
+def test_detrended_power_std_drift():
+    from scipy.signal import detrend
+    from ieeg.calc.stats import detrended_power_std
+    rng = np.random.default_rng(1)
+    n = 100000
+    # a large DC offset and drift relative to the noise
+    data = 1e5 + 1e4 * np.arange(n) / n + rng.standard_normal((4, n))
+    data[2] *= 5
+    expected = np.square(detrend(data))
+    expected[expected == 0] = 1e-9
+    expected = np.std(expected, 1)
+    out = detrended_power_std(lambda i, j: data[:, i:j], n, 7000)
+    assert np.allclose(out, expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, None])
+def test_find_outliers_batched(batch_size):
+    from ieeg.calc.stats import find_outliers
+    rng = np.random.default_rng(42)
+    data = rng.standard_normal((20, 4, 100))
+    dat = np.abs(data)
+    expected = np.max(dat, -1) < (2 * np.std(dat, (-1, 0)) +
+                                  np.mean(dat, (-1, 0)))
+    assert np.array_equal(find_outliers(data, 2, batch_size), expected)